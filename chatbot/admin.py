@@ -1,11 +1,82 @@
 from django.contrib import admin
+from django.db import transaction
+
+import logging
+
 from .models import Recipe
+from .tasks import embed_recipe
+
+
+logger = logging.getLogger(__name__)
+
+
+# 임베딩 작업 예약 (DB 커밋 후 Celery embedding 큐로 전송)
+def queue_embedding(recipe):
+    Recipe.objects.filter(id=recipe.id).update(
+        embedding_status=Recipe.STATUS_QUEUED, embedding_error=""
+    )
+
+    def send():
+        try:
+            # 브로커가 없을 때 재시도하며 관리자 요청을 붙잡지 않도록 바로 실패시킴
+            result = embed_recipe.apply_async((recipe.id,), retry=False)
+        # 브로커 연결 오류(kombu OperationalError 등)는 CeleryError가 아니므로 모두 처리
+        # (예약됨 상태로 남지 않도록 실패로 표시, 관리자 액션으로 다시 실행 가능)
+        except Exception as e:
+            logger.warning("recipe %s: failed to queue embedding: %s", recipe.id, e)
+            Recipe.objects.filter(id=recipe.id).update(
+                embedding_status=Recipe.STATUS_FAILED,
+                embedding_error=f"작업 예약 실패: {e}",
+            )
+            return
+        Recipe.objects.filter(id=recipe.id).update(embedding_task_id=result.id)
+
+    transaction.on_commit(send)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("csv_file", "is_embedded")  # Admin 페이지에서 보이는 컬럼 설정
+    list_display = (
+        "csv_file",
+        "is_embedded",
+        "embedding_status",
+        "embedding_progress",
+    )  # Admin 페이지에서 보이는 컬럼 설정
     readonly_fields = (
         "is_embedded",
-    )  # `is_embedded`는 관리자도 수정 불가능 (읽기 전용)
-    list_filter = ("is_embedded",)  # 필터 추가 (임베딩 여부별로 정렬 가능)
+        "embedded_chunks",
+        "total_chunks",
+        "embedding_status",
+        "embedding_error",
+        "embedding_task_id",
+    )  # 임베딩 상태/진행률은 관리자도 수정 불가능 (읽기 전용)
+    list_filter = (
+        "is_embedded",
+        "embedding_status",
+    )  # 필터 추가 (임베딩 여부별로 정렬 가능)
+    actions = ["queue_selected_embeddings"]
+
+    @admin.display(description="진행률")
+    def embedding_progress(self, obj):
+        if not obj.total_chunks:
+            # 파일을 끝까지 읽기 전에는 전체 청크 수를 모름
+            return f"{obj.embedded_chunks}/?" if obj.embedded_chunks else "-"
+        percent = obj.embedded_chunks * 100 // obj.total_chunks
+        return f"{obj.embedded_chunks}/{obj.total_chunks} ({percent}%)"
+
+    # CSV 업로드 시 바로 백그라운드 임베딩 시작
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change and not obj.is_embedded:
+            queue_embedding(obj)
+
+    # 실패한 임베딩 다시 실행 (저장된 진행률부터 이어서 진행)
+    def queue_selected_embeddings(self, request, queryset):
+        recipes = queryset.filter(is_embedded=False)
+        for recipe in recipes:
+            queue_embedding(recipe)
+        self.message_user(
+            request, f"{recipes.count()}개의 레시피 임베딩을 예약했습니다."
+        )
+
+    queue_selected_embeddings.short_description = "선택한 레시피 임베딩 실행"
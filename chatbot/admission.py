@@ -0,0 +1,142 @@
+from django.conf import settings
+
+from collections import deque
+from contextlib import asynccontextmanager
+from threading import Lock
+import asyncio
+import time
+
+from .metrics import ADMISSION_QUEUE, ADMISSION_REJECTED
+from .timing import record_timing
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Waiter:
+    def __init__(self, user_key):
+        self.user_key = user_key
+        self.admitted = False
+        # 다른 스레드의 이벤트 루프에서 깨울 수 있도록 루프를 기억
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self):
+        await self.event.wait()
+        self.event.clear()
+
+
+# 워커 프로세스 단위 LLM 동시 호출 제한
+# 전체 동시 생성 수와 사용자별 동시 생성 수를 제한하고,
+# 자리가 없으면 도착 순서대로(FIFO) 대기시키며 대기열이 가득 차면 바로 거절
+class AdmissionController:
+    def __init__(self):
+        self._lock = Lock()
+        self._active = 0
+        self._active_by_user = {}
+        self._waiters = deque()
+
+    @property
+    def limits(self):
+        return settings.CHATBOT_ADMISSION
+
+    def status(self):
+        with self._lock:
+            return {"active": self._active, "queued": len(self._waiters)}
+
+    @asynccontextmanager
+    async def slot(self, user_key, on_position=None):
+        await self.acquire(user_key, on_position)
+        try:
+            yield
+        finally:
+            self.release(user_key)
+
+    # on_position: 대기 순번이 바뀔 때마다 호출되는 코루틴 함수 (1부터 시작)
+    async def acquire(self, user_key, on_position=None):
+        waiter = _Waiter(user_key)
+        started = time.perf_counter()
+        with self._lock:
+            self._waiters.append(waiter)
+            self._dispatch()
+            if not waiter.admitted and len(self._waiters) > self.limits["MAX_QUEUE"]:
+                self._waiters.remove(waiter)
+                ADMISSION_REJECTED.inc()
+                raise QueueFull(
+                    "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요."
+                )
+            ADMISSION_QUEUE.set(len(self._waiters))
+
+        position = None
+        try:
+            while not waiter.admitted:
+                current = self._position(waiter)
+                if on_position is not None and current and current != position:
+                    position = current
+                    await on_position(current)
+                if not waiter.admitted:
+                    await waiter.wait()
+        except BaseException:
+            # 대기 중 연결이 끊기면 대기열에서 빼고, 이미 받은 자리는 반납
+            with self._lock:
+                if waiter.admitted:
+                    self._free(user_key)
+                else:
+                    self._waiters.remove(waiter)
+                    self._notify()
+            raise
+        record_timing("queue", time.perf_counter() - started)
+
+    def release(self, user_key):
+        with self._lock:
+            self._free(user_key)
+
+    def _free(self, user_key):
+        self._active -= 1
+        remaining = self._active_by_user[user_key] - 1
+        if remaining:
+            self._active_by_user[user_key] = remaining
+        else:
+            del self._active_by_user[user_key]
+        self._dispatch()
+
+    def _position(self, waiter):
+        with self._lock:
+            try:
+                return self._waiters.index(waiter) + 1
+            except ValueError:
+                return None
+
+    # 앞에서부터 자리를 배정 (사용자별 한도에 걸린 요청은 건너뛰고 다음 요청에 배정)
+    def _dispatch(self):
+        limits = self.limits
+        admitted = []
+        for waiter in self._waiters:
+            if self._active >= limits["MAX_CONCURRENT"]:
+                break
+            if self._active_by_user.get(waiter.user_key, 0) >= limits["PER_USER"]:
+                continue
+            self._active += 1
+            self._active_by_user[waiter.user_key] = (
+                self._active_by_user.get(waiter.user_key, 0) + 1
+            )
+            waiter.admitted = True
+            admitted.append(waiter)
+
+        if admitted:
+            for waiter in admitted:
+                self._waiters.remove(waiter)
+            self._notify(admitted)
+
+    # 자리를 받은 요청과 순번이 당겨진 요청을 깨움
+    def _notify(self, admitted=()):
+        for waiter in (*admitted, *self._waiters):
+            waiter.wake()
+        ADMISSION_QUEUE.set(len(self._waiters))
+
+
+admission = AdmissionController()
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.files import File
+
+import csv
+import os
+import random
+import resource
+
+import numpy as np
+import psutil
+
+from .models import Recipe
+
+
+# 벤치마크/부하 테스트용 합성 레시피 데이터
+INGREDIENTS = [
+    "닭가슴살", "돼지고기", "소고기", "두부", "계란", "양파", "감자", "당근", "애호박",
+    "버섯", "김치", "대파", "마늘", "고추", "양배추", "브로콜리", "토마토", "새우",
+    "오징어", "고등어", "연어", "우유", "치즈", "땅콩", "밀가루", "쌀", "현미", "고구마",
+]  # fmt: skip
+COOKING = [
+    "볶음",
+    "조림",
+    "찌개",
+    "샐러드",
+    "구이",
+    "덮밥",
+    "무침",
+    "전",
+    "수프",
+    "파스타",
+]
+QUESTION_TEMPLATES = [
+    "{a} 들어간 요리 추천해줘",
+    "{a}랑 {b}로 만들 수 있는 요리 알려줘",
+    "저녁으로 먹을 {a} {cooking} 레시피 알려줘",
+    "다이어트 중인데 {a} 요리 추천해줄래?",
+    "{a} {cooking}",
+]
+PROFILES = [
+    {"allergies": [], "diet": False, "preferred_cuisine": []},
+    {"allergies": ["땅콩"], "diet": False, "preferred_cuisine": ["한식"]},
+    {"allergies": ["우유", "새우"], "diet": True, "preferred_cuisine": []},
+]
+
+
+def write_synthetic_corpus(path, recipes, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["요리명", "재료", "칼로리", "조리법"])
+        for index in range(recipes):
+            ingredients = rng.sample(INGREDIENTS, rng.randint(3, 6))
+            name = f"{ingredients[0]} {rng.choice(COOKING)} {index}"
+            steps = " ".join(
+                f"{step}. {ingredient}을(를) 손질해 넣고 {rng.randint(2, 15)}분 익힌다."
+                for step, ingredient in enumerate(ingredients, start=1)
+            )
+            writer.writerow(
+                [name, ", ".join(ingredients), f"{rng.randint(150, 900)}kcal", steps]
+            )
+
+
+def synthetic_questions(count, seed=0):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        a, b = rng.sample(INGREDIENTS, 2)
+        template = rng.choice(QUESTION_TEMPLATES)
+        questions.append(template.format(a=a, b=b, cooking=rng.choice(COOKING)))
+    return questions
+
+
+# 합성 레시피 CSV를 임시 벡터 DB에 적재 (Recipe 행은 만들지 않음)
+def seed_vector_store(manager, directory, recipes, seed=0):
+    path = os.path.join(directory, "synthetic_recipes.csv")
+    write_synthetic_corpus(path, recipes, seed)
+    with open(path, "rb") as f:
+        recipe = Recipe(id=0, csv_file=File(f, name=path))
+        allergens = sorted({a for profile in PROFILES for a in profile["allergies"]})
+        return manager.index_recipe(recipe, allergens)
+
+
+# 네트워크 없이 실행할 가짜 제공자 설정 (CHATBOT_PROVIDERS 대체용)
+def offline_providers(embedding_latency, llm_latency, tokens_per_second):
+    providers = settings.CHATBOT_PROVIDERS
+    return {
+        **providers,
+        "EMBEDDING": "fake",
+        "LLM": "fake",
+        "FAKE": {
+            **providers["FAKE"],
+            "EMBEDDING_LATENCY": embedding_latency,
+            "LLM_LATENCY": llm_latency,
+            "TOKENS_PER_SECOND": tokens_per_second,
+        },
+    }
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    array = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean_ms": round(float(array.mean()), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(array.max()), 2),
+    }
+
+
+def rss_mb():
+    # ru_maxrss는 리눅스에서 KB 단위
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    current = psutil.Process().memory_info().rss / 2**20
+    return {"current": round(current, 1), "peak": round(peak, 1)}
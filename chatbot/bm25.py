@@ -0,0 +1,195 @@
+from langchain_core.documents import Document
+
+from collections import Counter, defaultdict
+from threading import Lock
+import json
+import math
+import os
+import re
+import unicodedata
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# 한국어는 띄어쓰기/조사 때문에 단어 단위 매칭이 약해서 글자 2-gram 사용
+def tokenize(text):
+    tokens = []
+    for word in WORD_PATTERN.findall(unicodedata.normalize("NFC", text).lower()):
+        if len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def normalize_query(text):
+    return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+
+# 벡터 검색 결과와 합치기 위한 문서 키
+def document_key(doc):
+    return doc.metadata.get("chunk_id") or doc.page_content
+
+
+# Reciprocal Rank Fusion: 여러 검색 결과의 순위를 합산
+def reciprocal_rank_fusion(result_lists, k=60, limit=None):
+    scores = defaultdict(float)
+    documents = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = document_key(doc)
+            scores[key] += 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:limit]]
+
+
+# 벡터 DB와 같은 청크를 가지는 프로세스 내 BM25 역색인
+class BM25Index:
+
+    def __init__(self, path=None, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = Lock()
+
+        self.documents = {}  # chunk_id -> {"text", "metadata", "length"}
+        self.postings = defaultdict(dict)  # token -> {chunk_id: tf}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            index._add(data["ids"], data["texts"], data["metadatas"])
+        return index
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            ids = list(self.documents)
+            data = {
+                "ids": ids,
+                "texts": [self.documents[i]["text"] for i in ids],
+                "metadatas": [self.documents[i]["metadata"] for i in ids],
+            }
+
+        # 저장 도중 종료되어도 기존 파일이 깨지지 않도록 임시 파일 후 교체
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _remove(self, chunk_id):
+        document = self.documents.pop(chunk_id, None)
+        if document is None:
+            return
+        self.total_length -= document["length"]
+        for token in set(tokenize(document["text"])):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[token]
+
+    def _add(self, ids, texts, metadatas):
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            # 같은 청크가 다시 들어오면 교체
+            self._remove(chunk_id)
+
+            tokens = tokenize(text)
+            self.documents[chunk_id] = {
+                "text": text,
+                "metadata": metadata or {},
+                "length": len(tokens),
+            }
+            self.total_length += len(tokens)
+            for token, count in Counter(tokens).items():
+                self.postings[token][chunk_id] = count
+
+    # 새로 임베딩한 청크만 추가 (증분 동기화)
+    def add(self, ids, texts, metadatas):
+        with self._lock:
+            self._add(ids, texts, metadatas)
+
+    def _document(self, chunk_id):
+        document = self.documents[chunk_id]
+        return Document(page_content=document["text"], metadata=document["metadata"])
+
+    def _score(self, query_tokens, candidates=None):
+        count = len(self.documents)
+        average_length = self.total_length / count
+
+        scores = defaultdict(float)
+        for token in set(query_tokens):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                if candidates is not None and chunk_id not in candidates:
+                    continue
+                length = self.documents[chunk_id]["length"]
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _matches(self, chunk_id, filter):
+        if filter is None:
+            return True
+        document = self.documents[chunk_id]
+        return filter(document["metadata"], document["text"])
+
+    def search(self, query, k=10, filter=None):
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            if not self.documents:
+                return []
+            scores = self._score(query_tokens)
+            ranked = [
+                chunk_id
+                for chunk_id in sorted(scores, key=scores.get, reverse=True)
+                if self._matches(chunk_id, filter)
+            ][:k]
+            return [self._document(chunk_id) for chunk_id in ranked]
+
+    # 재료명/요리명처럼 짧은 질문이 문서에 그대로 있는 경우 (임베딩 없이 처리 가능)
+    def exact_search(self, query, k=10, max_length=10, filter=None):
+        query = normalize_query(query)
+        if not query or len(query) > max_length:
+            return []
+
+        query_tokens = tokenize(query)
+        with self._lock:
+            candidates = None
+            for token in set(query_tokens):
+                postings = set(self.postings.get(token, ()))
+                candidates = postings if candidates is None else candidates & postings
+                if not candidates:
+                    return []
+
+            matches = {
+                chunk_id
+                for chunk_id in candidates or ()
+                if query in normalize_query(self.documents[chunk_id]["text"])
+                and self._matches(chunk_id, filter)
+            }
+            if not matches:
+                return []
+
+            scores = self._score(query_tokens, candidates=matches)
+            ranked = sorted(
+                matches, key=lambda chunk_id: scores[chunk_id], reverse=True
+            )
+            return [self._document(chunk_id) for chunk_id in ranked[:k]]
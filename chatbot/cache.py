@@ -0,0 +1,160 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+import hashlib
+import time
+
+from .metrics import SEMANTIC_CACHE
+from .profile import shared_profile_prompt
+
+
+SEMANTIC_CACHE_PREFIX = "chatbot:semantic"
+
+# 레시피 인덱스 버전 (레시피가 새로 임베딩될 때마다 증가)
+RECIPE_INDEX_VERSION_KEY = f"{SEMANTIC_CACHE_PREFIX}:version"
+
+# 가득 찬 지문에 저장할 때 고른 슬롯을 다른 저장 요청이 고르지 않도록 선점하는 시간(초)
+SLOT_CLAIM_TIMEOUT = 5
+
+
+# 알러지/선호 음식/다이어트 여부로 지문 생성 (이 값이 같은 사용자끼리 답변을 함께 씀)
+def profile_fingerprint(user_data):
+    raw = shared_profile_prompt(user_data)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# numpy는 챗봇 엔진을 쓸 때만 불러옴 (엔진 모듈이 이 파일의 캐시 키를 import)
+def _numpy():
+    import numpy
+
+    return numpy
+
+
+# 기본 aincr는 get/set으로 나뉘어 동시에 올리면 값이 겹침 → 동기 incr(Redis INCR) 사용
+@sync_to_async(thread_sensitive=False)
+def _incr(key, timeout=None):
+    cache.add(key, 0, timeout=timeout)
+    return cache.incr(key)
+
+
+# 질문 임베딩 유사도 기반 답변 캐시 (Redis 캐시 사용)
+class SemanticAnswerCache:
+
+    def __init__(self, config=None):
+        config = {**settings.CHATBOT_SEMANTIC_CACHE, **(config or {})}
+        self.enabled = config["ENABLED"]
+        self.threshold = config["THRESHOLD"]
+        self.ttl = config["TTL"]
+        self.max_entries = config["MAX_ENTRIES"]
+
+    # 레시피 인덱스가 바뀌면 버전을 올려 기존 답변을 모두 무효화
+    async def _index_version(self):
+        return await cache.aget(RECIPE_INDEX_VERSION_KEY, 0)
+
+    def invalidate(self):
+        cache.add(RECIPE_INDEX_VERSION_KEY, 0, timeout=None)
+        cache.incr(RECIPE_INDEX_VERSION_KEY)
+
+    async def _bucket_key(self, fingerprint):
+        version = await self._index_version()
+        return f"{SEMANTIC_CACHE_PREFIX}:{version}:{fingerprint}"
+
+    # 답변마다 벡터/답변/마지막 사용 시각 키를 따로 둠
+    # 빈 슬롯은 지문별 카운터(원자적 증가)로 나눠 주고, 가득 차면 가장 오래 사용되지 않은 슬롯을 재사용
+    def _slot_keys(self, bucket, slot):
+        return (
+            f"{bucket}:vector:{slot}",
+            f"{bucket}:answer:{slot}",
+            f"{bucket}:used:{slot}",
+        )
+
+    async def lookup(self, embedding, fingerprint):
+        if not self.enabled:
+            return None
+
+        bucket = await self._bucket_key(fingerprint)
+        count = await cache.aget(f"{bucket}:count", 0)
+        slots = range(min(count, self.max_entries))
+        slot_of = {self._slot_keys(bucket, slot)[0]: slot for slot in slots}
+        vectors = await cache.aget_many(list(slot_of))
+
+        best, best_score = None, -1.0
+        if vectors:
+            np = _numpy()
+            keys = list(vectors)
+            query = np.array(embedding, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            matrix = np.stack(
+                [np.frombuffer(vectors[key][1], dtype=np.float32) for key in keys]
+            )
+            scores = matrix @ query
+            index = int(np.argmax(scores))
+            best, best_score = keys[index], float(scores[index])
+
+        answer = None
+        if best is not None and best_score >= self.threshold:
+            _, answer_key, used_key = self._slot_keys(bucket, slot_of[best])
+            answer = await cache.aget(answer_key)
+            # 벡터를 읽은 뒤 다른 답변으로 바뀐 슬롯은 사용하지 않음
+            if answer is not None and answer[0] != vectors[best][0]:
+                answer = None
+
+        if answer is None:
+            SEMANTIC_CACHE.inc(result="miss")
+            return None
+        # 적중하면 사용 시각만 갱신 (벡터/답변은 다시 쓰지 않음)
+        await cache.aset(used_key, time.time(), timeout=self.ttl)
+        SEMANTIC_CACHE.inc(result="hit")
+        return answer[1]
+
+    # 저장할 슬롯 선택 (동시에 저장하는 요청이 같은 슬롯을 고르지 않도록 잠깐 선점)
+    async def _claim_slot(self, bucket):
+        try:
+            entry_id = await _incr(f"{bucket}:count", self.ttl)
+        except ValueError:
+            # add와 incr 사이에 카운터가 만료된 경우 저장하지 않음
+            return None, None
+        if entry_id <= self.max_entries:
+            return entry_id, entry_id - 1
+
+        used_keys = [
+            self._slot_keys(bucket, slot)[2] for slot in range(self.max_entries)
+        ]
+        used = await cache.aget_many(used_keys)
+        slots = sorted(
+            range(self.max_entries), key=lambda slot: used.get(used_keys[slot], 0)
+        )
+        for slot in slots:
+            claimed = await cache.aadd(
+                f"{bucket}:claim:{slot}", entry_id, timeout=SLOT_CLAIM_TIMEOUT
+            )
+            if claimed:
+                return entry_id, slot
+        return entry_id, slots[0]
+
+    async def store(self, embedding, fingerprint, answer):
+        if not self.enabled or not answer:
+            return
+
+        np = _numpy()
+        vector = np.array(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+
+        bucket = await self._bucket_key(fingerprint)
+        entry_id, slot = await self._claim_slot(bucket)
+        if slot is None:
+            return
+
+        vector_key, answer_key, used_key = self._slot_keys(bucket, slot)
+        await cache.aset_many(
+            {
+                vector_key: (entry_id, vector.tobytes()),
+                answer_key: (entry_id, answer),
+                used_key: time.time(),
+            },
+            timeout=self.ttl,
+        )
+
+
+semantic_cache = SemanticAnswerCache()
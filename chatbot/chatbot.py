@@ -1,26 +1,32 @@
 # LangChain
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_chroma import Chroma
-from langchain_community.document_loaders.csv_loader import CSVLoader
+import chromadb
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-
-# Langfuse(챗봇 트레이싱 및 운영툴)
-from langfuse import Langfuse
-from langfuse.callback import CallbackHandler
-
+from contextlib import nullcontext
 from threading import Lock
 import os
 
 
 from django.conf import settings
 from .models import Recipe
-
-# Langfuse config 설정을 settings에서 가져오기
-langfuse = Langfuse(**settings.LANGFUSE_CONFIG)
-langfuse_handler = CallbackHandler(**settings.LANGFUSE_CONFIG)
+from .cache import profile_fingerprint, semantic_cache
+from .context import build_context
+from .embeddings import CachedEmbeddings
+from .embedding_store import EmbeddingStore
+from .providers import get_embeddings, get_llm
+from .profile import profile_prompt, shared_profile_prompt
+from .prompts import prompt_cache, served_prompt_version
+from .singleflight import flight_key, single_flight
+from .tracing import tracing_callbacks
+from .timing import record_timing, timed
+from .llm_metrics import llm_metrics_handler
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .ingestion import RecipeIngestor, iter_csv_documents
+from .ingredients import allergy_filter, passes_allergy_filter, recipe_metadata
+from accounts.models import Allergy
 
 
 # 레시피 임베딩 및 백터DB저장
@@ -44,27 +50,170 @@ class VectorStoreManager:
 
         print("Initializing VectorStoreManager with ChromaDB...")
 
+        # 임베딩 결과 캐싱 (질문 검색 + 문서 적재 공통)
+        # 문서 청크 임베딩은 디스크에도 저장해 재청킹/재색인 시 API를 다시 호출하지 않음
+        embeddings, model_name = get_embeddings()
+        self.embeddings = CachedEmbeddings(
+            embeddings,
+            model_name=model_name,
+            store=EmbeddingStore(
+                os.path.join(persist_directory, "embedding_store"),
+                model_name=model_name,
+            ),
+        )
+        self.persist_directory = persist_directory
+        self.search_kwargs = {
+            "k": 3,
+            "fetch_k": 10,
+        }
+        self.hybrid_config = settings.CHATBOT_HYBRID_SEARCH
+        self._open_index()
+
+        print(" Vector Store is ready!")
+
+    def _open_index(self):
+        self.client = chromadb.PersistentClient(path=self.persist_directory)
         self.db = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=OpenAIEmbeddings(model="text-embedding-ada-002"),
+            client=self.client,
+            embedding_function=self.embeddings,
             collection_metadata={
                 "hnsw:space": "cosine",
             },
         )
         self.retriever = self.db.as_retriever(
             search_type="mmr",
-            search_kwargs={
-                "k": 3,
-                "fetch_k": 10,
-            },
+            search_kwargs=self.search_kwargs,
         )
 
-        print(" Vector Store is ready!")
+        # 같은 청크에 대한 BM25 역색인 (하이브리드 검색)
+        self.bm25 = BM25Index.load(
+            os.path.join(self.persist_directory, "bm25_index.json")
+        )
+        if not len(self.bm25):
+            self._bootstrap_bm25()
+
+    # 다른 프로세스(Celery 워커)에서 임베딩한 레시피 반영
+    def reload_index(self):
+        # 같은 경로의 Chroma 클라이언트는 프로세스 안에서 공유되므로 캐시를 비워야 새로 읽음
+        self.client.clear_system_cache()
+        with self._lock:
+            self._open_index()
+        print(" Vector Store reloaded!")
+
+    # 기존 벡터 DB만 있는 경우 저장된 청크로 BM25 색인 생성
+    def _bootstrap_bm25(self):
+        stored = self.db.get(include=["documents", "metadatas"])
+        if not stored["ids"]:
+            return
+        metadatas = [
+            {**(metadata or {}), "chunk_id": chunk_id}
+            for chunk_id, metadata in zip(stored["ids"], stored["metadatas"])
+        ]
+        self.bm25.add(stored["ids"], stored["documents"], metadatas)
+        self.bm25.save()
 
     def get_retriever(self):
         with self._lock:
             return self.retriever
 
+    # 이미 계산된 질문 임베딩으로 MMR 검색 (임베딩 재계산 없음)
+    async def asearch_by_vector(self, embedding, allergies=()):
+        if not allergies:
+            return await self.db.amax_marginal_relevance_search_by_vector(
+                embedding, **self.search_kwargs
+            )
+
+        # 알러지 플래그는 적재 당시 있던 알러지 항목만 있고 $ne는 플래그가 없는 청크도 통과시킴
+        # → 후보를 fetch_k개까지 받아 BM25와 같은 조건(재료 목록)으로 다시 거름
+        docs = await self.db.amax_marginal_relevance_search_by_vector(
+            embedding,
+            filter=allergy_filter(allergies),
+            **{**self.search_kwargs, "k": self.search_kwargs["fetch_k"]},
+        )
+        docs = [
+            doc
+            for doc in docs
+            if passes_allergy_filter(doc.metadata, allergies, doc.page_content)
+        ]
+        return docs[: self.search_kwargs["k"]]
+
+    def _bm25_filter(self, allergies):
+        if not allergies:
+            return None
+        return lambda metadata, text: passes_allergy_filter(metadata, allergies, text)
+
+    # 짧은 재료명/요리명이 그대로 있는 경우 임베딩 없이 BM25 결과만 사용
+    def exact_search(self, query, allergies=()):
+        return self.bm25.exact_search(
+            query,
+            k=self.search_kwargs["k"],
+            max_length=self.hybrid_config["EXACT_MAX_LENGTH"],
+            filter=self._bm25_filter(allergies),
+        )
+
+    # MMR 벡터 검색 + BM25 결과를 RRF로 결합 (알러지 재료가 들어간 레시피는 검색 단계에서 제외)
+    async def asearch(self, query, allergies=(), diet=False):
+        results = self.exact_search(query, allergies)
+        if not results:
+            embedding = await self.embeddings.aembed_query(query)
+            vector_results = await self.asearch_by_vector(embedding, allergies)
+            lexical_results = self.bm25.search(
+                query,
+                k=self.hybrid_config["BM25_K"],
+                filter=self._bm25_filter(allergies),
+            )
+            results = reciprocal_rank_fusion(
+                [vector_results, lexical_results],
+                k=self.hybrid_config["RRF_K"],
+                limit=self.search_kwargs["k"],
+            )
+
+        # 다이어트 중인 사용자는 다이어트 레시피를 앞에 배치
+        if diet:
+            results.sort(key=lambda doc: not doc.metadata.get("is_diet", False))
+        return results
+
+    # CSV를 한 행씩 읽어 (청크 id, 텍스트, 메타데이터)를 차례로 생성 (파일 전체를 메모리에 올리지 않음)
+    def _iter_chunks(self, file_obj, allergens):
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHATBOT_INGESTION["CHUNK_SIZE"],
+            chunk_overlap=settings.CHATBOT_INGESTION["CHUNK_OVERLAP"],
+        )
+
+        index = 0
+        for doc in iter_csv_documents(file_obj.csv_file):
+            # 행 단위로 재료 목록/다이어트 태그/알러지 플래그 추출 (청크에 그대로 복사됨)
+            doc.metadata.update(recipe_metadata(doc.page_content, allergens))
+
+            # 청크 id는 파일 id + 순번으로 고정 (중단 후 재시작 시 같은 id로 덮어씀)
+            for text in text_splitter.split_text(doc.page_content):
+                chunk_id = f"{file_obj.id}-{index}"
+                yield chunk_id, text, {**doc.metadata, "chunk_id": chunk_id}
+                index += 1
+
+    # CSV 청크를 벡터 DB/BM25 색인에 추가 (Recipe의 임베딩 완료 여부는 바꾸지 않음)
+    def index_recipe(self, file_obj, allergens, on_progress=None):
+        chunks = self._iter_chunks(file_obj, allergens)
+        try:
+            return RecipeIngestor(self).ingest(file_obj, chunks, on_progress)
+        finally:
+            # BM25 색인도 같은 청크로 갱신
+            self.bm25.save()
+
+    def add_recipe(self, file_obj, allergens=None, on_progress=None):
+        if allergens is None:
+            allergens = list(Allergy.objects.values_list("ingredient", flat=True))
+
+        print(f"Loading {file_obj.csv_file.name}...")
+        stats = self.index_recipe(file_obj, allergens, on_progress)
+
+        print(f"{file_obj.csv_file.name} loaded successfully!")
+
+        # CSV 파일을 벡터 DB에 추가했으므로, `is_embedded=True`로 업데이트
+        file_obj.is_embedded = True
+        file_obj.save()
+        return stats
+
     def add_file(self):
         csv_files = Recipe.objects.filter(is_embedded=False)
 
@@ -73,70 +222,187 @@ class VectorStoreManager:
             print(" No unembedded CSV files found.")
             return
 
+        # 검색 시 제외할 알러지 재료 목록
+        allergens = list(Allergy.objects.values_list("ingredient", flat=True))
+
         # 파일 불러와 벡터 DB에 추가
-        for file_obj in csv_files:
-            file_path = file_obj.csv_file.path
-            print(f"Loading {file_path}...")
-
-            #  CSV 로드 및 문서 변환
-            loader = CSVLoader(file_path=file_path, encoding="utf-8")
-            data = loader.load()
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=700, chunk_overlap=150
-            )
-            splits = text_splitter.split_documents(data)
+        try:
+            for file_obj in csv_files:
+                self.add_recipe(file_obj, allergens)
+        finally:
+            # 레시피 인덱스가 바뀌었으므로 캐시된 답변 무효화
+            semantic_cache.invalidate()
+
+    # 벡터 DB/BM25 색인을 처음부터 다시 생성 (청크 설정 변경 시)
+    # 텍스트가 같은 청크는 임베딩 저장소에서 가져오므로 API 호출 없음
+    def rebuild(self):
+        with self._lock:
+            self.db.delete_collection()
+            bm25_path = os.path.join(self.persist_directory, "bm25_index.json")
+            if os.path.exists(bm25_path):
+                os.remove(bm25_path)
+            self._open_index()
+
+        Recipe.objects.update(is_embedded=False, embedded_chunks=0, total_chunks=None)
+        self.add_file()
+        Recipe.objects.filter(is_embedded=True).update(
+            embedding_status=Recipe.STATUS_DONE, embedding_error=""
+        )
+
 
-            # 벡터 DB에 올바르게 추가 (텍스트 & 메타데이터 분리)
-            texts = [doc.page_content for doc in splits]
-            metadatas = [doc.metadata for doc in splits]
-            self.db.add_texts(texts, metadatas=metadatas)
+# 검색된 레시피 문서를 프롬프트용 텍스트로 변환
+def format_recipes(inputs):
+    return build_context(inputs["recipes"])
 
-            print(f"{file_path} loaded successfully!")
 
-            # CSV 파일을 벡터 DB에 추가했으므로, `is_embedded=True`로 업데이트
-            file_obj.is_embedded = True
-            file_obj.save()
+# 체인 단계 실행 시간 기록 (벤치마크용, collect_timings() 밖에서는 무시됨)
+def _timing_listener(stage):
+    def on_end(run):
+        record_timing(stage, (run.end_time - run.start_time).total_seconds())
+
+    return on_end
 
 
 class Chatbot_Run:
-    def __init__(self):
+    def __init__(self, llm_config=None):
         print("Initializing RAGManager...")
 
-        # LLM 설정
-        self.llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.9)
-
-        # 프롬프트 불러오기
-        langfuse_prompt = langfuse.get_prompt("TastePT")
+        # LLM 설정 (엔진 핫스왑 시 다른 설정으로 생성 가능)
+        self.llm_config = {**settings.CHATBOT_LLM_CONFIG, **(llm_config or {})}
+        self.llm = get_llm(self.llm_config)
 
-        self.prompt = ChatPromptTemplate.from_template(
-            langfuse_prompt.get_langchain_prompt(),
-            metadata={"langfuse_prompt": langfuse_prompt},
-        )
+        # 프롬프트는 턴마다 캐시에서 꺼내 사용 (Langfuse 조회는 백그라운드에서만)
+        prompt_cache.get()
         self.db = VectorStoreManager()
         self.retriever = self.db.get_retriever()
+        self.embeddings = self.db.embeddings
+
+        # 검색 단계별로 Langfuse span이 남도록 이름 지정
+        self.embed_query = RunnableLambda(self._aembed_query).with_config(
+            run_name="query_embedding"
+        )
 
-        # RAG Chain 생성
+        # RAG Chain 생성 (검색은 질문당 한 번만 수행)
         self.rag_chain = (
-            {
-                "recipes": self.retriever,
-                "question": RunnablePassthrough(),
-                "user_data": RunnablePassthrough(),
-            }
-            | self.prompt
-            | self.llm
+            RunnablePassthrough.assign(
+                recipes=RunnableLambda(self._asearch).with_config(run_name="mmr_search")
+            )
+            | RunnablePassthrough.assign(
+                recipes=RunnableLambda(format_recipes)
+                .with_config(run_name="format_recipes")
+                .with_listeners(on_end=_timing_listener("prompt"))
+            )
+            | RunnableLambda(self._aformat_prompt)
+            .with_config(run_name="prompt")
+            .with_listeners(on_end=_timing_listener("prompt"))
+            | self.llm.with_config(callbacks=[llm_metrics_handler])
         )
 
-    async def ask(self, query: str, user_data):
-        # MMR로 문서 검색 후 BM25 기반 리랭킹
-        mmr_recipes = await self.retriever.ainvoke(query)
-        input_data = {
-            "recipes": mmr_recipes,
+    @property
+    def prompt_version(self):
+        return prompt_cache.version
+
+    # 턴 시작 때 고른 프롬프트로 입력을 채움 (턴 도중 프롬프트가 갱신돼도 섞이지 않음)
+    async def _aformat_prompt(self, inputs, config):
+        prompt = config["configurable"]["prompt"]
+        return await prompt.ainvoke(inputs, config)
+
+    async def _aembed_query(self, query: str):
+        return await self.embeddings.aembed_query(query)
+
+    async def _asearch(self, inputs):
+        # 질문 임베딩은 캐시 조회 때 계산한 값을 재사용 (프로세스 메모리 캐시 적중)
+        with timed("retrieval"):
+            return await self.db.asearch(
+                inputs["question"],
+                allergies=inputs["allergies"],
+                diet=inputs["diet"],
+            )
+
+    # shared: 캐시해서 다른 사용자에게도 쓸 답변이면 개인 정보 없는 프롬프트 사용
+    def _chain_input(self, query: str, user_data, conversation="", shared=False):
+        return {
             "question": query,
-            "user_data": user_data,
+            "user_data": (
+                shared_profile_prompt(user_data)
+                if shared
+                else profile_prompt(user_data)
+            ),
+            "conversation": conversation or "없음",
+            "allergies": list(user_data.get("allergies") or []),
+            "diet": bool(user_data.get("diet")),
         }
-        # str으로 변환
-        input_data_str = str(input_data)
 
-        return await self.rag_chain.ainvoke(
-            input_data_str, config={"callbacks": [langfuse_handler]}
+    # 비슷한 질문에 대한 캐시된 답변 조회 (프롬프트 버전별로 따로 캐시)
+    async def _lookup_cache(self, query: str, user_data, conversation, prompt_version):
+        # 이전 대화에 기대는 후속 질문은 같은 문장이라도 답이 달라 캐시하지 않음
+        if conversation:
+            return None, None, None
+
+        # 재료명/요리명 검색은 임베딩 없이 BM25로 바로 처리
+        with timed("retrieval"):
+            exact = self.db.exact_search(query, user_data.get("allergies") or ())
+        if exact:
+            return None, None, None
+
+        with timed("embedding"):
+            embedding = await self.embed_query.ainvoke(
+                query, config={"callbacks": tracing_callbacks()}
+            )
+        fingerprint = f"{profile_fingerprint(user_data)}:{prompt_version}"
+        with timed("cache"):
+            answer = await semantic_cache.lookup(embedding, fingerprint)
+        return embedding, fingerprint, answer
+
+    async def ask(self, query: str, user_data, conversation="", admit=None):
+        chunks = [
+            chunk async for chunk in self.astream(query, user_data, conversation, admit)
+        ]
+        return AIMessage(content="".join(chunks))
+
+    # 토큰 단위 스트리밍 응답
+    # 같은 질문/사용자 정보/대화 맥락의 요청이 동시에 오면 생성 작업 하나를 공유
+    # (프롬프트에 닉네임 등이 들어가므로 프롬프트에 넣는 사용자 정보 전체가 같아야 공유)
+    # 답변에 쓴 프롬프트 버전은 served_prompt_version에 기록
+    # admit: LLM 자리를 받는 비동기 컨텍스트 매니저를 만드는 함수
+    # 자리는 공유된 생성 작업이 LLM을 호출할 때 한 번만 받음 (같은 질문에 합류한 요청은 자리를 쓰지 않음)
+    async def astream(self, query: str, user_data, conversation="", admit=None):
+        prompt, version = prompt_cache.get()
+        served_prompt_version.set(version)
+        key = flight_key(query, f"{version}\0{profile_prompt(user_data)}", conversation)
+        async for chunk in single_flight.stream(
+            key,
+            lambda: self._generate(
+                query, user_data, conversation, prompt, version, admit
+            ),
+        ):
+            yield chunk
+
+    async def _generate(
+        self, query: str, user_data, conversation, prompt, version, admit=None
+    ):
+        embedding, fingerprint, answer = await self._lookup_cache(
+            query, user_data, conversation, version
         )
+        if answer is not None:
+            yield answer
+            return
+
+        chunks = []
+        async with admit() if admit else nullcontext():
+            async for chunk in self.rag_chain.astream(
+                self._chain_input(
+                    query, user_data, conversation, shared=embedding is not None
+                ),
+                config={
+                    "callbacks": tracing_callbacks(),
+                    "configurable": {"prompt": prompt},
+                },
+            ):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+
+        if embedding is not None:
+            with timed("cache"):
+                await semantic_cache.store(embedding, fingerprint, "".join(chunks))
@@ -1,85 +1,99 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import sync_to_async
-from django.core.exceptions import ObjectDoesNotExist
 
+from .admission import QueueFull, admission
 from .models import ChatRoom, ChatMessage
-from .chatbot import Chatbot_Run
+from .engine import engine
+from .history import afetch_history_page, serialize_message
+from .memory import aload_conversation, schedule_summary
+from .metrics import WEBSOCKET_CONNECTIONS, track_turn
+from .prompts import served_prompt_version
+from .timing import timed
 from .utils import get_user_data
 import json
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
-        print("WebSocket 연결:", self.user)
+        logger.info("WebSocket 연결: %s", self.user)
 
         if self.user.is_authenticated:
             self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
 
             # 채팅방 존재 여부 확인
             try:
-                self.room = await sync_to_async(ChatRoom.objects.get)(id=self.room_id)
-            except ObjectDoesNotExist:
+                self.room = await ChatRoom.objects.aget(id=self.room_id)
+            except ChatRoom.DoesNotExist:
                 await self.close()
                 return
 
-            await self.channel_layer.group_add(
-                f"chat_{self.room_id}", self.channel_name
-            )
+            # 같은 방에 연결된 다른 탭(다른 워커 프로세스 포함)과 프레임 공유
+            self.group_name = f"chat_{self.room_id}"
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
             await self.accept()
+            self.counted = True
+            WEBSOCKET_CONNECTIONS.inc()
 
-            # 이전 채팅 기록 로드
-            messages = await self.get_chat_history()
-            await self.send(json.dumps({"type": "chat_history", "messages": messages}))
+            # 이전 채팅 기록 로드 (최근 N개 + 이전 페이지 커서)
+            history = await self.get_chat_history()
+            await self.send(json.dumps({"type": "chat_history", **history}))
         else:
             await self.close()
 
-    @sync_to_async
-    def get_chat_history(self):
-        messages = ChatMessage.objects.filter(room_id=self.room_id).order_by(
-            "created_at"
-        )
-        return [
-            {
-                "sender": (
-                    "bot"
-                    if msg.message_type == ChatMessage.CHATBOT_RESPONSE
-                    else (
-                        "system"
-                        if msg.message_type == ChatMessage.SYSTEM_MESSAGE
-                        else "user"
-                    )
-                ),
-                "message": msg.message,
-                "timestamp": msg.created_at.isoformat(),
-                "message_type": msg.message_type,
-                "parent_id": msg.parent_message_id if msg.parent_message_id else None,
-            }
-            for msg in messages
-        ]
+    # 최근 메시지 한 페이지 (이전 메시지는 load_older로 요청)
+    async def get_chat_history(self, cursor=None):
+        return await afetch_history_page(self.room_id, cursor)
 
-    @sync_to_async
-    def save_user_question(self, message):
-        return ChatMessage.objects.create(
+    # 질문/답변은 각각 INSERT 한 번 (autocommit)
+    # LLM 응답을 기다리는 동안 트랜잭션을 열어 두지 않음
+    async def save_user_question(self, message):
+        return await ChatMessage.objects.acreate(
             room_id=self.room_id,
             user=self.user,
             message=message,
             message_type=ChatMessage.USER_QUESTION,
         )
 
-    @sync_to_async
-    def save_bot_response(self, message, parent_question):
-        return ChatMessage.objects.create(
+    async def save_bot_response(self, message, parent_question):
+        return await ChatMessage.objects.acreate(
             room_id=self.room_id,
             user=self.user,
             message=message,
             message_type=ChatMessage.CHATBOT_RESPONSE,
             parent_message=parent_question,
+            prompt_version=served_prompt_version.get(),
         )
 
+    # 방의 다른 연결로 프레임 전송 (보낸 연결은 제외)
+    async def broadcast(self, frame):
+        await self.channel_layer.group_send(
+            self.group_name,
+            {"type": "chat.frame", "frame": frame, "origin": self.channel_name},
+        )
+
+    # 보낸 연결에는 바로 전송하고 같은 방의 다른 연결에도 전달
+    # (receive 처리 중에는 그룹 메시지가 턴이 끝난 뒤에야 처리되므로 직접 전송)
+    async def publish(self, frame):
+        await self.send(json.dumps(frame, ensure_ascii=False))
+        await self.broadcast(frame)
+
+    async def chat_frame(self, event):
+        if event["origin"] != self.channel_name:
+            await self.send(json.dumps(event["frame"], ensure_ascii=False))
+
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
+
+            # 이전 메시지 페이지 요청
+            if data.get("type") == "load_older":
+                await self.send_older_messages(data.get("cursor"))
+                return
+
             message = data.get("message", "").strip()
 
             if not message:
@@ -90,51 +104,136 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.send(json.dumps({"error": "로그인을 해주세요."}))
                 return
 
-            # 사용자 메시지 저장
-            await self.save_user_question(message)
-
-            # 사용자 정보 가져오기
-            user_data = await get_user_data(self.user)
-            user_data_str = await sync_to_async(str)(user_data)
-
-            # 챗봇 응답 생성
-            chatbot = Chatbot_Run()
-            response = await chatbot.ask(message, user_data_str)
-            response_content = await sync_to_async(str)(response.content)
+            # 스트리밍 모드: 토큰이 생성되는 대로 chunk 프레임 전송
+            mode = "stream" if data.get("stream") else "ask"
+            with track_turn(mode):
+                if mode == "stream":
+                    await self.stream_response(message)
+                else:
+                    await self.ask_response(message)
 
-            # 챗봇 응답 저장
-            await self.save_bot_response(
-                response_content, await self.save_user_question(message)
-            )
+            # 오래된 대화 요약은 응답을 보낸 뒤 백그라운드에서 처리
+            schedule_summary(self.room_id)
 
-            # 응답 전송
+        except QueueFull as e:
             await self.send(
-                json.dumps(
-                    {
-                        "sender": "chatbot",
-                        "message_type": ChatMessage.CHATBOT_RESPONSE,
-                        "message": response_content,
-                        "timestamp": (
-                            await sync_to_async(ChatMessage.objects.latest)(
-                                "created_at"
-                            )
-                        ).created_at.isoformat(),
-                    },
-                    ensure_ascii=False,
-                )
+                json.dumps({"type": "busy", "error": str(e)}, ensure_ascii=False)
             )
-
         except Exception as e:
-            import traceback
-
-            traceback.print_exc()
+            logger.exception(
+                "챗봇 응답 생성 실패 (room %s)", getattr(self, "room_id", None)
+            )
             await self.send(
                 json.dumps({"sender": "system", "error": f"오류 발생: {str(e)}"})
             )
 
-    async def disconnect(self, close_code):
-        if hasattr(self, "room_id"):
-            await self.channel_layer.group_discard(
-                f"chat_{self.room_id}", self.channel_name
+    # LLM 자리가 날 때까지 대기 순번을 알려 주고, 대기열이 가득 차면 거절
+    # (자리는 답변 생성 작업이 받으므로 같은 질문에 합류한 요청은 기다리지 않음)
+    def admit(self):
+        return admission.slot(self.user.pk, self.send_queue_position)
+
+    async def ask_response(self, message):
+        # 이전 대화 맥락 (이번 질문을 저장하기 전에 읽음)
+        with timed("memory"):
+            conversation = await aload_conversation(self.room_id)
+
+        # 사용자 메시지 저장
+        with timed("persistence"):
+            question = await self.save_user_question(message)
+        await self.broadcast({"type": "question", **serialize_message(question)})
+
+        # 사용자 정보 가져오기
+        with timed("user_data"):
+            user_data = await get_user_data(self.user)
+
+        # 챗봇 응답 생성
+        chatbot = await engine.aget()
+        try:
+            response = await chatbot.ask(
+                message, user_data, conversation, admit=self.admit
             )
-        print("WebSocket 연결 종료:", close_code)
+        except QueueFull:
+            # 자리를 받지 못해 답변이 없는 질문은 기록에 남기지 않음
+            await question.adelete()
+            raise
+        response_content = str(response.content)
+
+        # 챗봇 응답 저장
+        with timed("persistence"):
+            saved = await self.save_bot_response(response_content, question)
+
+        # 응답 전송
+        await self.publish(
+            {
+                "sender": "chatbot",
+                "message_type": ChatMessage.CHATBOT_RESPONSE,
+                "message": response_content,
+                "message_id": saved.id,
+                "parent_id": question.id,
+                "timestamp": saved.created_at.isoformat(),
+            }
+        )
+
+    async def send_queue_position(self, position):
+        await self.send(json.dumps({"type": "queued", "position": position}))
+
+    async def send_older_messages(self, cursor):
+        if not cursor:
+            await self.send(json.dumps({"error": "커서가 필요합니다."}))
+            return
+        try:
+            page = await self.get_chat_history(cursor)
+        except ValueError as e:
+            await self.send(json.dumps({"error": str(e)}, ensure_ascii=False))
+            return
+        await self.send(json.dumps({"type": "older_messages", **page}))
+
+    async def stream_response(self, message):
+        with timed("memory"):
+            conversation = await aload_conversation(self.room_id)
+
+        with timed("persistence"):
+            question = await self.save_user_question(message)
+        await self.broadcast({"type": "question", **serialize_message(question)})
+
+        with timed("user_data"):
+            user_data = await get_user_data(self.user)
+
+        chatbot = await engine.aget()
+        chunks = []
+        try:
+            async for token in chatbot.astream(
+                message, user_data, conversation, admit=self.admit
+            ):
+                chunks.append(token)
+                # 같은 방에서 동시에 진행 중인 답변과 구분하도록 질문 id 포함
+                await self.publish(
+                    {"type": "chunk", "message": token, "parent_id": question.id}
+                )
+        except QueueFull:
+            # 자리를 받지 못해 답변이 없는 질문은 기록에 남기지 않음
+            await question.adelete()
+            raise
+
+        # 전체 응답은 마지막에 한 번만 저장
+        with timed("persistence"):
+            response = await self.save_bot_response("".join(chunks), question)
+
+        await self.publish(
+            {
+                "type": "done",
+                "sender": "chatbot",
+                "message_type": ChatMessage.CHATBOT_RESPONSE,
+                "message_id": response.id,
+                "parent_id": question.id,
+                "timestamp": response.created_at.isoformat(),
+            }
+        )
+
+    async def disconnect(self, close_code):
+        if getattr(self, "counted", False):
+            self.counted = False
+            WEBSOCKET_CONNECTIONS.dec()
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        logger.info("WebSocket 연결 종료: %s", close_code)
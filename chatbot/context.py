@@ -0,0 +1,102 @@
+from django.conf import settings
+
+import logging
+
+from .metrics import CONTEXT_TOKENS
+from .tokens import count_tokens, truncate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+# 우연히 끝/시작 몇 글자가 같은 경우는 겹침으로 보지 않음
+MIN_OVERLAP = 8
+
+
+def _chunk_index(doc):
+    # 청크 id는 "파일 id-순번" 형식
+    _, _, index = str(doc.metadata.get("chunk_id", "")).rpartition("-")
+    return int(index) if index.isdigit() else None
+
+
+def _overlap(previous, text):
+    for size in range(min(len(previous), len(text)), MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:size]):
+            return size
+    return 0
+
+
+# 같은 행에서 나온 청크를 원래 순서대로 합침 (이웃한 청크는 겹치는 부분을 한 번만 남김)
+def merge_chunks(docs):
+    docs = sorted(docs, key=lambda doc: _chunk_index(doc) or 0)
+    merged = docs[0].page_content
+    previous_index = _chunk_index(docs[0])
+    for doc in docs[1:]:
+        index, text = _chunk_index(doc), doc.page_content
+        adjacent = index is not None and index - 1 == previous_index
+        previous_index = index
+        if text in merged:
+            continue
+        overlap = _overlap(merged, text) if adjacent else 0
+        merged = merged + text[overlap:] if overlap else f"{merged}\n{text}"
+    return merged
+
+
+# 검색 순위를 유지하면서 CSV 행 단위로 묶음
+def group_by_row(docs):
+    groups = {}
+    for doc in docs:
+        source, row = doc.metadata.get("source"), doc.metadata.get("row")
+        key = (source, row) if row is not None else id(doc)
+        groups.setdefault(key, []).append(doc)
+    return list(groups.values())
+
+
+# "컬럼: 값" 줄에서 빈 값과 중복 공백 제거
+def compact_recipe(text):
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        name, sep, value = line.partition(":")
+        if not line or (sep and not value.strip()):
+            continue
+        if line not in lines:
+            lines.append(line)
+    return lines
+
+
+# 검색된 청크를 프롬프트에 넣을 레시피 목록으로 조립 (토큰 예산을 넘는 레시피는 제외)
+def build_context(docs, max_tokens=None):
+    if not docs:
+        return ""
+    if max_tokens is None:
+        max_tokens = settings.CHATBOT_CONTEXT["MAX_TOKENS"]
+
+    recipes = []
+    budget = max_tokens
+    for group in group_by_row(docs):
+        lines = compact_recipe(merge_chunks(group))
+        text = "\n".join(lines)
+        tokens = count_tokens(text) + 1
+        if tokens > budget:
+            # 첫 레시피는 예산에 맞게 잘라서라도 넣음
+            if recipes:
+                break
+            text = truncate_tokens(text, budget)
+            tokens = count_tokens(text)
+        recipes.append(text)
+        budget -= tokens
+
+    context = "\n\n".join(recipes)
+    retrieved = count_tokens("\n\n".join(doc.page_content for doc in docs))
+    sent = count_tokens(context)
+    CONTEXT_TOKENS.inc(retrieved, kind="retrieved")
+    CONTEXT_TOKENS.inc(sent, kind="prompt")
+    logger.info(
+        "context: %d chunks -> %d recipes, %d -> %d tokens (saved %d)",
+        len(docs),
+        len(recipes),
+        retrieved,
+        sent,
+        retrieved - sent,
+    )
+    return context
@@ -0,0 +1,136 @@
+from contextlib import contextmanager
+from threading import Lock
+import fcntl
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+DIGEST_SIZE = 32  # sha256
+
+
+# 청크 텍스트 해시 -> 임베딩 벡터를 디스크에 저장 (재청킹/재색인 시 API 재호출 방지)
+# keys.bin: 행마다 32바이트 해시, vectors.f32: 행마다 float32 벡터 (둘 다 추가 전용)
+# Celery 워커/웹 프로세스/관리 명령이 같은 디렉터리를 함께 쓰므로
+# 추가는 파일 잠금(flock) 안에서 실제 파일 크기로 행 번호를 정하고,
+# 다른 프로세스가 추가한 행은 조회 시 파일에서 읽어 색인에 반영
+class EmbeddingStore:
+
+    def __init__(self, directory, model_name):
+        self.directory = os.path.join(directory, model_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.lock_path = os.path.join(self.directory, "store.lock")
+
+        self._lock = Lock()
+        self._index = {}
+        self._rows = 0
+        self._vectors = None
+        self.dim = None
+        with self._file_lock(fcntl.LOCK_SH):
+            self._sync()
+
+    def __len__(self):
+        return len(self._index)
+
+    @staticmethod
+    def _digest(text):
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    @contextmanager
+    def _file_lock(self, operation):
+        with open(self.lock_path, "ab") as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # 벡터와 키가 모두 기록된 행 수 (쓰는 도중 종료된 행은 제외)
+    def _complete_rows(self):
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return 0
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        try:
+            vector_rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+            key_rows = os.path.getsize(self.keys_path) // DIGEST_SIZE
+        except FileNotFoundError:
+            return 0
+        return min(vector_rows, key_rows)
+
+    # 마지막으로 읽은 뒤 추가된 행을 색인에 반영 (파일 잠금 안에서 호출)
+    def _sync(self):
+        rows = self._complete_rows()
+        if rows <= self._rows:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._rows * DIGEST_SIZE)
+            keys = f.read((rows - self._rows) * DIGEST_SIZE)
+        for offset in range(rows - self._rows):
+            digest = keys[offset * DIGEST_SIZE : (offset + 1) * DIGEST_SIZE]
+            self._index.setdefault(digest, self._rows + offset)
+        self._rows = rows
+        self._map(rows)
+
+    def _map(self, rows):
+        if rows:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+
+    def _lookup(self, texts):
+        return [self._index.get(self._digest(text)) for text in texts]
+
+    def get_many(self, texts):
+        with self._lock:
+            rows = self._lookup(texts)
+            # 없는 텍스트는 다른 프로세스가 그사이 추가했을 수 있으므로 파일을 다시 확인
+            if None in rows:
+                with self._file_lock(fcntl.LOCK_SH):
+                    self._sync()
+                rows = self._lookup(texts)
+            return [
+                None if row is None else self._vectors[row].tolist() for row in rows
+            ]
+
+    def put_many(self, texts, vectors):
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+            new = {}
+            for text, vector in zip(texts, vectors):
+                digest = self._digest(text)
+                if digest not in self._index:
+                    new[digest] = vector
+            if not new:
+                return
+
+            array = np.asarray(list(new.values()), dtype=np.float32)
+            if self.dim is None:
+                self.dim = array.shape[1]
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+
+            # 중단된 쓰기로 남은 불완전한 행은 쓰기 잠금 안에서만 잘라냄
+            for path, row_size in (
+                (self.vectors_path, self.dim * 4),
+                (self.keys_path, DIGEST_SIZE),
+            ):
+                with open(path, "ab") as f:
+                    f.truncate(self._rows * row_size)
+
+            # 벡터를 먼저 기록하고 키를 나중에 기록
+            with open(self.vectors_path, "ab") as f:
+                f.write(array.tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(new))
+
+            for offset, digest in enumerate(new):
+                self._index[digest] = self._rows + offset
+            self._rows += len(new)
+            self._map(self._rows)
@@ -0,0 +1,175 @@
+from langchain_core.embeddings import Embeddings
+from django.conf import settings
+from django.core.cache import cache
+
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import time
+import unicodedata
+
+import numpy as np
+
+
+EMBEDDING_CACHE_PREFIX = "chatbot:embedding"
+
+
+def normalize_text(text):
+    # 유니코드 정규화 + 공백 정리 (같은 질문이 같은 키를 갖도록)
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+# 임베딩 결과를 프로세스 메모리(LRU)와 Redis에 2단계로 캐싱
+# Redis에는 질문 임베딩만 저장 (문서 임베딩은 대량 적재 시 Redis를 채우지 않도록 EmbeddingStore에만 저장)
+class CachedEmbeddings(Embeddings):
+
+    def __init__(self, embeddings, model_name, config=None, store=None):
+        config = {**settings.CHATBOT_EMBEDDING_CACHE, **(config or {})}
+        self.embeddings = embeddings
+        self.model_name = model_name
+        # 문서 임베딩용 디스크 저장소 (EmbeddingStore, 질문 임베딩은 저장하지 않음)
+        self.store = store
+        self.local_size = config["LOCAL_SIZE"]
+        self.ttl = config["TTL"]
+
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+        # 캐시 통계
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    def _key(self, text):
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{EMBEDDING_CACHE_PREFIX}:{self.model_name}:{digest}"
+
+    def _get_local(self, key):
+        with self._lock:
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+            return vector
+
+    def _set_local(self, key, vector):
+        with self._lock:
+            self._local[key] = vector
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    # 로컬 → Redis 순서로 조회, 없는 항목의 인덱스 반환
+    def _lookup(self, keys, redis_values):
+        vectors = [None] * len(keys)
+        missing = []
+        for index, key in enumerate(keys):
+            vector = self._get_local(key)
+            if vector is not None:
+                self.local_hits += 1
+            elif key in redis_values:
+                vector = np.frombuffer(redis_values[key], dtype=np.float32).tolist()
+                self._set_local(key, vector)
+                self.redis_hits += 1
+            else:
+                missing.append(index)
+                continue
+            vectors[index] = vector
+        return vectors, missing
+
+    def _remember(self, keys, vectors, missing, new_vectors, elapsed):
+        self.misses += len(missing)
+        self.miss_seconds += elapsed
+
+        to_redis = {}
+        for index, vector in zip(missing, new_vectors):
+            vectors[index] = vector
+            self._set_local(keys[index], vector)
+            to_redis[keys[index]] = np.asarray(vector, dtype=np.float32).tobytes()
+        return to_redis
+
+    def _local_keys_missing(self, keys):
+        with self._lock:
+            return [key for key in keys if key not in self._local]
+
+    # 디스크 저장소에 있는 문서 임베딩은 API 호출 없이 사용
+    def _lookup_store(self, texts, vectors, missing):
+        stored = self.store.get_many([texts[i] for i in missing])
+        still_missing = []
+        for index, vector in zip(missing, stored):
+            if vector is None:
+                still_missing.append(index)
+            else:
+                vectors[index] = vector
+                self.store_hits += 1
+        return still_missing
+
+    def _embed(self, texts, use_store, use_redis):
+        keys = [self._key(text) for text in texts]
+        redis_values = (
+            cache.get_many(self._local_keys_missing(keys)) if use_redis else {}
+        )
+        vectors, missing = self._lookup(keys, redis_values)
+
+        if missing and use_store:
+            missing = self._lookup_store(texts, vectors, missing)
+
+        if missing:
+            started = time.perf_counter()
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            elapsed = time.perf_counter() - started
+            to_redis = self._remember(keys, vectors, missing, new_vectors, elapsed)
+            if use_redis:
+                cache.set_many(to_redis, timeout=self.ttl)
+            if use_store:
+                self.store.put_many([texts[i] for i in missing], new_vectors)
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._embed(texts, use_store=self.store is not None, use_redis=False)
+
+    def embed_query(self, text):
+        return self._embed([text], use_store=False, use_redis=True)[0]
+
+    async def _aembed(self, texts, use_redis):
+        keys = [self._key(text) for text in texts]
+        redis_values = (
+            await cache.aget_many(self._local_keys_missing(keys)) if use_redis else {}
+        )
+        vectors, missing = self._lookup(keys, redis_values)
+
+        if missing:
+            started = time.perf_counter()
+            new_vectors = await self.embeddings.aembed_documents(
+                [texts[i] for i in missing]
+            )
+            elapsed = time.perf_counter() - started
+            to_redis = self._remember(keys, vectors, missing, new_vectors, elapsed)
+            if use_redis:
+                await cache.aset_many(to_redis, timeout=self.ttl)
+        return vectors
+
+    async def aembed_documents(self, texts):
+        return await self._aembed(texts, use_redis=False)
+
+    async def aembed_query(self, text):
+        # 프로세스 메모리에 있으면 Redis 왕복 없이 바로 반환
+        vector = self._get_local(self._key(text))
+        if vector is not None:
+            self.local_hits += 1
+            return vector
+        return (await self._aembed([text], use_redis=True))[0]
+
+    def stats(self):
+        hits = self.local_hits + self.redis_hits + self.store_hits
+        total = hits + self.misses
+        average_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "saved_seconds": round(hits * average_miss, 3),
+        }
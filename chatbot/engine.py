@@ -0,0 +1,156 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from threading import Lock
+import time
+
+from .cache import RECIPE_INDEX_VERSION_KEY
+
+
+# 워커 간 핫스왑 설정 공유용 캐시 키
+ENGINE_CONFIG_CACHE_KEY = "chatbot:engine:config"
+
+
+# 워커 프로세스당 하나만 만들어 재사용하는 챗봇 엔진
+class ChatbotEngine:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+                cls._instance._chatbot = None
+                cls._instance._build_lock = Lock()
+                cls._instance.version = 0
+                cls._instance.llm_config = {}
+                cls._instance.warmup_seconds = None
+                cls._instance.loaded_at = None
+                cls._instance.index_version = 0
+                cls._instance._synced_at = 0.0
+        return cls._instance
+
+    @property
+    def is_ready(self):
+        return self._chatbot is not None
+
+    # 엔진 생성 (프롬프트, LLM, RAG 체인을 한 번에 준비)
+    # RAG 스택(LangChain, Chroma 등)은 엔진을 처음 만들 때 불러옴
+    # 챗봇을 쓰지 않는 워커/엔드포인트는 import 비용과 메모리를 쓰지 않음
+    def _build(self, llm_config):
+        from .chatbot import Chatbot_Run
+
+        started = time.perf_counter()
+        chatbot = Chatbot_Run(llm_config=llm_config)
+        elapsed = time.perf_counter() - started
+
+        # 완성된 엔진으로 한 번에 교체 (처리 중인 요청은 기존 엔진을 그대로 사용)
+        self._chatbot = chatbot
+        self.index_version = cache.get(RECIPE_INDEX_VERSION_KEY, 0)
+        self.llm_config = llm_config
+        self.warmup_seconds = elapsed
+        self.loaded_at = time.time()
+        print(f"Chatbot engine v{self.version} ready in {elapsed * 1000:.0f}ms")
+        return chatbot
+
+    # ASGI 시작 시 미리 엔진 생성
+    def warm_up(self):
+        from .prompts import prompt_cache
+
+        prompt_cache.warm_up()
+        with self._build_lock:
+            if self._chatbot is None:
+                self._build(self.llm_config)
+        return self.warmup_seconds
+
+    # 만든 엔진을 버리고 다음 요청에서 다시 생성 (부하 테스트가 임시 벡터 DB를 쓸 때)
+    def discard(self):
+        with self._build_lock:
+            self._chatbot = None
+
+    def get(self):
+        self._sync_from_cache()
+        chatbot = self._chatbot
+        if chatbot is not None:
+            return chatbot
+
+        with self._build_lock:
+            if self._chatbot is None:
+                self._build(self.llm_config)
+            return self._chatbot
+
+    async def aget(self):
+        # 준비된 엔진은 이벤트 루프에서 바로 반환, 최초 생성만 스레드에서 처리
+        if self._chatbot is not None and not self._sync_due():
+            return self._chatbot
+        return await sync_to_async(self.get, thread_sensitive=False)()
+
+    # 재시작 없이 프롬프트/LLM 설정 교체 (다른 워커에도 캐시를 통해 전파)
+    def reload(self, llm_config=None):
+        from .prompts import prompt_cache
+
+        # 관리자 요청에서는 TTL을 기다리지 않고 프롬프트를 바로 다시 받음
+        prompt_cache.refresh()
+        with self._build_lock:
+            config = cache.get(ENGINE_CONFIG_CACHE_KEY) or {"version": 0}
+            version = max(config["version"], self.version) + 1
+            new_config = {**self.llm_config, **(llm_config or {})}
+
+            self.version = version
+            self._build(new_config)
+            cache.set(
+                ENGINE_CONFIG_CACHE_KEY,
+                {"version": version, "llm_config": new_config},
+                timeout=None,
+            )
+            self._synced_at = time.monotonic()
+        return self.status()
+
+    async def areload(self, llm_config=None):
+        return await sync_to_async(self.reload, thread_sensitive=False)(llm_config)
+
+    def _sync_due(self):
+        return (
+            time.monotonic() - self._synced_at >= settings.CHATBOT_ENGINE_SYNC_INTERVAL
+        )
+
+    # 다른 워커에서 reload 된 경우 같은 설정으로 다시 생성
+    def _sync_from_cache(self):
+        if not self._sync_due():
+            return
+        self._synced_at = time.monotonic()
+
+        # Celery 워커에서 새 레시피가 임베딩되면 벡터 DB/BM25 색인 다시 읽기
+        index_version = cache.get(RECIPE_INDEX_VERSION_KEY, 0)
+        if self._chatbot is not None and index_version != self.index_version:
+            self.index_version = index_version
+            self._chatbot.db.reload_index()
+
+        config = cache.get(ENGINE_CONFIG_CACHE_KEY)
+        if not config or config["version"] <= self.version:
+            return
+
+        with self._build_lock:
+            if config["version"] > self.version:
+                self.version = config["version"]
+                self._build(config["llm_config"])
+
+    def status(self):
+        chatbot = self._chatbot
+        return {
+            "ready": chatbot is not None,
+            "version": self.version,
+            "llm_config": chatbot.llm_config if chatbot else self.llm_config,
+            "prompt_version": chatbot.prompt_version if chatbot else None,
+            "warmup_ms": (
+                round(self.warmup_seconds * 1000, 1)
+                if self.warmup_seconds is not None
+                else None
+            ),
+            "loaded_at": self.loaded_at,
+            "embedding_cache": chatbot.embeddings.stats() if chatbot else None,
+        }
+
+
+engine = ChatbotEngine()
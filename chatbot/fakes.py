@@ -0,0 +1,107 @@
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import asyncio
+import hashlib
+import time
+
+import numpy as np
+
+
+def _stable_hash(text):
+    # 파이썬 hash()는 프로세스마다 달라지므로 sha256 사용
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+# 네트워크 없이 쓰는 결정적 임베딩 (글자 bigram 해시 -> 고정 차원 벡터)
+# 글자가 많이 겹치는 문장일수록 코사인 유사도가 높아 캐시/검색 동작을 그대로 재현
+class FakeEmbeddings(Embeddings):
+
+    def __init__(self, dim=384, latency=0.0):
+        self.dim = dim
+        self.latency = latency  # 요청 1회당 지연(초)
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = "".join(text.split())
+        grams = [text[i : i + 2] for i in range(max(len(text) - 1, 1))]
+        for gram in grams:
+            value = _stable_hash(gram)
+            vector[value % self.dim] += 1.0 if value & 1 << 32 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+# 네트워크 없이 쓰는 결정적 LLM (첫 토큰 지연 + 초당 토큰 수로 스트리밍 속도 재현)
+class FakeChatModel(BaseChatModel):
+    model_name: str = "fake-chat"
+    temperature: float = 0.0
+    latency: float = 0.0  # 첫 토큰까지 지연(초)
+    tokens_per_second: float = 0.0  # 0이면 토큰 사이 지연 없음
+    response_tokens: int = 80
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    # 프롬프트 단어로 답변 생성 (같은 프롬프트면 항상 같은 답변)
+    def _tokens(self, messages):
+        words = " ".join(str(message.content) for message in messages).split()
+        if not words:
+            words = ["..."]
+        seed = _stable_hash(" ".join(words))
+        return [
+            words[(seed + i * 7919) % len(words)] + " "
+            for i in range(self.response_tokens)
+        ]
+
+    def _interval(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + self._interval() * len(tokens))
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + self._interval() * len(tokens))
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in self._tokens(messages):
+            time.sleep(self._interval())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(messages):
+            await asyncio.sleep(self._interval())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
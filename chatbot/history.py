@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import Q
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from .models import ChatMessage
+
+
+SENDERS = {
+    ChatMessage.CHATBOT_RESPONSE: "bot",
+    ChatMessage.SYSTEM_MESSAGE: "system",
+}
+
+
+def serialize_message(msg):
+    return {
+        "id": msg.id,
+        "sender": SENDERS.get(msg.message_type, "user"),
+        "message": msg.message,
+        "timestamp": msg.created_at.isoformat(),
+        "message_type": msg.message_type,
+        "parent_id": msg.parent_message_id if msg.parent_message_id else None,
+    }
+
+
+# 페이지에서 가장 오래된 메시지의 (created_at, id)를 커서로 사용
+def encode_cursor(msg):
+    raw = f"{msg.created_at.isoformat()}|{msg.id}"
+    return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, _, message_id = (
+            urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rpartition("|")
+        )
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (AttributeError, UnicodeError, ValueError) as e:
+        raise ValueError("잘못된 커서입니다.") from e
+
+
+# (room_id, created_at, id) 인덱스를 타는 키셋 페이지네이션
+# 메시지가 아무리 많아도 조회 비용은 페이지 크기만큼만 듦
+def _page_query(room_id, cursor, limit):
+    messages = ChatMessage.objects.filter(room_id=room_id).only(
+        "id", "message", "message_type", "created_at", "parent_message_id"
+    )
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        messages = messages.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+        )
+    # 한 개 더 가져와 이전 페이지가 있는지 확인
+    return messages.order_by("-created_at", "-id")[: limit + 1]
+
+
+def fetch_history_page(room_id, cursor=None, limit=None):
+    limit = limit or settings.CHATBOT_HISTORY_PAGE_SIZE
+    return _build_page(list(_page_query(room_id, cursor, limit)), limit)
+
+
+# WebSocket 소비자용 (비동기 ORM으로 조회)
+async def afetch_history_page(room_id, cursor=None, limit=None):
+    limit = limit or settings.CHATBOT_HISTORY_PAGE_SIZE
+    page = [msg async for msg in _page_query(room_id, cursor, limit)]
+    return _build_page(page, limit)
+
+
+def _build_page(page, limit):
+    has_more = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+    return {
+        "messages": [serialize_message(msg) for msg in page],
+        "cursor": encode_cursor(page[0]) if has_more else None,
+        "has_more": has_more,
+    }
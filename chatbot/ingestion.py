@@ -0,0 +1,143 @@
+from django.conf import settings
+
+from langchain_core.documents import Document
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+import csv
+import io
+import time
+
+from .models import Recipe
+from .tokens import count_tokens
+
+
+def _strip(value):
+    if isinstance(value, list):
+        return ",".join(item.strip() for item in value)
+    return value.strip() if isinstance(value, str) else value
+
+
+# 레시피 CSV를 한 행씩 읽어 문서로 변환 (CSVLoader와 같은 "컬럼: 값" 형식)
+def iter_csv_documents(field_file):
+    with field_file.open("rb") as raw:
+        reader = csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+        for row_index, row in enumerate(reader):
+            content = "\n".join(f"{_strip(k)}: {_strip(v)}" for k, v in row.items())
+            yield Document(
+                page_content=content,
+                metadata={"source": field_file.name, "row": row_index},
+            )
+
+
+# 레시피 CSV 청크를 배치 단위로 나눠 동시에 임베딩 (중단 시 이어서 진행)
+class RecipeIngestor:
+
+    def __init__(self, manager, batch_size=None, concurrency=None):
+        config = settings.CHATBOT_INGESTION
+        self.manager = manager
+        self.batch_size = batch_size or config["BATCH_SIZE"]
+        self.concurrency = concurrency or config["CONCURRENCY"]
+
+    def _embed_batch(self, batch):
+        ids, texts, metadatas = zip(*batch)
+        # 청크 id가 고정이라 재시도해도 같은 항목을 덮어씀(upsert)
+        self.manager.db.add_texts(list(texts), metadatas=list(metadatas), ids=list(ids))
+        return sum(count_tokens(text) for text in texts)
+
+    def _save_progress(self, recipe, embedded_chunks):
+        recipe.embedded_chunks = embedded_chunks
+        Recipe.objects.filter(pk=recipe.pk).update(embedded_chunks=embedded_chunks)
+
+    def _batches(self, chunks):
+        while True:
+            batch = list(islice(chunks, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    # 청크 제너레이터를 배치 단위로 소비 (동시에 메모리에 올라가는 배치 수 = concurrency)
+    def ingest(self, recipe, chunks, on_progress=None):
+        chunks = iter(chunks)
+        start = recipe.embedded_chunks
+
+        # 이전 실행에서 이미 저장된 청크는 BM25 색인만 다시 채움 (임베딩 없음)
+        if start:
+            print(f"Resuming {recipe.csv_file.name} from chunk {start}")
+            for batch in self._batches(islice(chunks, start)):
+                self.manager.bm25.add(*zip(*batch))
+
+        batches = enumerate(self._batches(chunks))
+        started = time.perf_counter()
+        tokens = 0
+        rows = 0
+        last_row = None
+
+        # 완료 순서와 상관없이 앞에서부터 연속으로 끝난 배치까지만 진행률로 기록
+        finished_sizes = {}
+        next_batch = 0
+        embedded = start
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = {}
+
+            def submit_next():
+                nonlocal rows, last_row
+                item = next(batches, None)
+                if item is None:
+                    return False
+                index, batch = item
+                for _, _, metadata in batch:
+                    if metadata.get("row") != last_row:
+                        last_row = metadata.get("row")
+                        rows += 1
+                pending[pool.submit(self._embed_batch, batch)] = (index, batch)
+                return True
+
+            while len(pending) < self.concurrency and submit_next():
+                pass
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index, batch = pending.pop(future)
+                    try:
+                        tokens += future.result()
+                    except Exception:
+                        for other in pending:
+                            other.cancel()
+                        raise
+
+                    finished_sizes[index] = len(batch)
+                    self.manager.bm25.add(*zip(*batch))
+
+                progress = embedded
+                while next_batch in finished_sizes:
+                    embedded += finished_sizes.pop(next_batch)
+                    next_batch += 1
+                if embedded != progress:
+                    self._save_progress(recipe, embedded)
+                    if on_progress:
+                        on_progress(embedded, recipe.total_chunks)
+
+                while len(pending) < self.concurrency and submit_next():
+                    pass
+
+        # 파일을 끝까지 읽은 뒤에야 전체 청크 수를 알 수 있음
+        recipe.total_chunks = embedded
+        Recipe.objects.filter(pk=recipe.pk).update(total_chunks=embedded)
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            "chunks": embedded - start,
+            "rows": rows,
+            "tokens": tokens,
+            "seconds": round(elapsed, 2),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+            "tokens_per_sec": round(tokens / elapsed, 1) if elapsed else 0.0,
+        }
+        print(
+            f"{recipe.csv_file.name}: {stats['chunks']} chunks in {stats['seconds']}s "
+            f"({stats['rows_per_sec']} rows/s, {stats['tokens_per_sec']} tokens/s)"
+        )
+        return stats
@@ -0,0 +1,109 @@
+import re
+import unicodedata
+
+
+# 재료/칼로리 정보가 들어있는 CSV 컬럼 이름
+INGREDIENT_COLUMNS = ("재료", "ingredient")
+CALORIE_COLUMNS = ("칼로리", "열량", "kcal", "calorie")
+DIET_KEYWORDS = ("다이어트", "저칼로리", "저탄수", "저지방", "고단백", "diet")
+DIET_MAX_CALORIES = 400
+
+ITEM_SEPARATOR = re.compile(r"[,/|·\n]")
+PARENTHESES = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+# 알러지 이름과 재료 목록을 같은 방식으로 비교 (공백 제거, 소문자)
+def normalize_allergen(name):
+    return "".join(unicodedata.normalize("NFC", name).split()).lower()
+
+
+def allergen_key(ingredient):
+    return f"allergen_{normalize_allergen(ingredient)}"
+
+
+# 알러지 재료를 찾을 텍스트: 재료 목록, 재료 컬럼이 없는 CSV는 레시피 전체 텍스트
+def allergen_haystack(ingredients, page_content):
+    return "|".join(sorted(ingredients)) or normalize_allergen(page_content)
+
+
+# CSVLoader 문서("컬럼: 값" 줄 목록)를 컬럼 딕셔너리로 변환
+def parse_row(page_content):
+    columns = {}
+    for line in page_content.splitlines():
+        name, sep, value = line.partition(":")
+        if sep:
+            columns[name.strip().lower()] = value.strip()
+    return columns
+
+
+def _normalize_ingredient(item):
+    item = PARENTHESES.sub(" ", unicodedata.normalize("NFC", item))
+    # 수량/단위가 붙은 단어 제거 ("닭가슴살 200g" -> "닭가슴살")
+    words = [word for word in item.split() if not NUMBER.search(word)]
+    return "".join(words).lower()
+
+
+def extract_ingredients(columns):
+    ingredients = set()
+    for name, value in columns.items():
+        if any(keyword in name for keyword in INGREDIENT_COLUMNS):
+            for item in ITEM_SEPARATOR.split(value):
+                ingredient = _normalize_ingredient(item)
+                if ingredient:
+                    ingredients.add(ingredient)
+    return ingredients
+
+
+def is_diet_recipe(page_content, columns):
+    if any(keyword in page_content.lower() for keyword in DIET_KEYWORDS):
+        return True
+    for name, value in columns.items():
+        if any(keyword in name for keyword in CALORIE_COLUMNS):
+            number = NUMBER.search(value)
+            if number and float(number.group()) <= DIET_MAX_CALORIES:
+                return True
+    return False
+
+
+# 청크 메타데이터용 재료 목록/다이어트 태그/알러지 플래그 생성
+def recipe_metadata(page_content, allergens):
+    columns = parse_row(page_content)
+    ingredients = extract_ingredients(columns)
+
+    # 나중에 추가된 알러지 항목도 같은 텍스트로 확인하도록 메타데이터에 저장
+    haystack = allergen_haystack(ingredients, page_content)
+
+    metadata = {
+        "ingredients": "|".join(sorted(ingredients)),
+        "allergen_text": haystack,
+        "is_diet": is_diet_recipe(page_content, columns),
+    }
+    for allergen in allergens:
+        metadata[allergen_key(allergen)] = normalize_allergen(allergen) in haystack
+    return metadata
+
+
+# 벡터 검색용 Chroma 메타데이터 필터 (알러지 재료가 들어간 청크 제외)
+def allergy_filter(allergies):
+    conditions = [{allergen_key(allergy): {"$ne": True}} for allergy in allergies]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+# 검색 결과에 같은 조건을 적용 (플래그가 없는 청크는 적재 때 저장한 텍스트로 확인)
+# allergen_text가 없는 예전 청크는 재료 목록, 그것도 없으면 청크 본문으로 확인
+def passes_allergy_filter(metadata, allergies, page_content=""):
+    haystack = metadata.get("allergen_text") or allergen_haystack(
+        filter(None, metadata.get("ingredients", "").split("|")), page_content
+    )
+    for allergy in allergies:
+        flag = metadata.get(allergen_key(allergy))
+        if flag is None:
+            flag = normalize_allergen(allergy) in haystack
+        if flag:
+            return False
+    return True
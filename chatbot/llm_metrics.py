@@ -0,0 +1,51 @@
+from langchain_core.callbacks import BaseCallbackHandler
+
+import time
+
+from .metrics import LLM_INFLIGHT, LLM_TOKENS
+from .timing import record_timing
+from .tokens import count_tokens
+
+
+# LLM 호출 시간/첫 토큰까지 시간/토큰 수/동시 호출 수 기록
+class LLMMetricsHandler(BaseCallbackHandler):
+    # 이벤트 루프에서 바로 실행 (스레드로 넘기지 않음)
+    run_inline = True
+
+    def __init__(self):
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = [time.perf_counter(), False]
+        LLM_INFLIGHT.inc()
+        prompt = "".join(str(m.content) for batch in messages for m in batch)
+        LLM_TOKENS.inc(count_tokens(prompt), kind="prompt")
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        state = self._started.get(run_id)
+        if state is not None and not state[1]:
+            state[1] = True
+            record_timing("first_token", time.perf_counter() - state[0])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        state = self._finish(run_id)
+        if state is not None:
+            record_timing("generation", time.perf_counter() - state[0])
+        text = "".join(
+            generation.text
+            for generations in response.generations
+            for generation in generations
+        )
+        LLM_TOKENS.inc(count_tokens(text), kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id):
+        state = self._started.pop(run_id, None)
+        if state is not None:
+            LLM_INFLIGHT.dec()
+        return state
+
+
+llm_metrics_handler = LLMMetricsHandler()
@@ -0,0 +1,203 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+import asyncio
+import json
+import subprocess
+import tempfile
+import time
+import uuid
+
+from chatbot.benchmark import (
+    PROFILES,
+    offline_providers,
+    percentiles,
+    rss_mb,
+    seed_vector_store,
+    synthetic_questions,
+)
+from chatbot.cache import semantic_cache
+from chatbot.models import ChatMessage, ChatRoom
+from chatbot.timing import collect_timings, timed
+
+
+STAGES = [
+    "embedding",
+    "retrieval",
+    "cache",
+    "prompt",
+    "first_token",
+    "generation",
+    "persistence",
+    "total",
+]
+
+
+@sync_to_async
+def save_turn(room, user, question, answer):
+    parent = ChatMessage.objects.create(
+        room=room, user=user, message=question, message_type=ChatMessage.USER_QUESTION
+    )
+    ChatMessage.objects.create(
+        room=room,
+        user=user,
+        message=answer,
+        message_type=ChatMessage.CHATBOT_RESPONSE,
+        parent_message=parent,
+    )
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 합성 레시피로 RAG 한 턴의 단계별 지연 시간 측정 (결과는 JSON)
+class Command(BaseCommand):
+    help = "Benchmark Chatbot_Run.ask end to end on a synthetic recipe corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=2000)
+        parser.add_argument("--questions", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--real",
+            action="store_true",
+            help="Use the configured providers instead of the offline fakes",
+        )
+        parser.add_argument("--embedding-latency", type=float, default=0.05)
+        parser.add_argument("--llm-latency", type=float, default=0.3)
+        parser.add_argument("--tokens-per-second", type=float, default=60.0)
+        parser.add_argument(
+            "--semantic-cache",
+            action="store_true",
+            help="Keep the semantic answer cache enabled",
+        )
+        parser.add_argument("--output", help="Also write the JSON report to a file")
+
+    def _providers(self, options):
+        if options["real"]:
+            return settings.CHATBOT_PROVIDERS
+        return offline_providers(
+            options["embedding_latency"],
+            options["llm_latency"],
+            options["tokens_per_second"],
+        )
+
+    def handle(self, *args, **options):
+        # 엔진/벡터 DB는 설정을 바꾼 뒤에 생성해야 하므로 여기서 import
+        from chatbot.chatbot import Chatbot_Run, VectorStoreManager
+
+        user_model = get_user_model()
+        suffix = uuid.uuid4().hex[:8]
+        user = user_model.objects.create_user(
+            email=f"bench-{suffix}@example.com", nickname=f"bench-{suffix}"
+        )
+        room = ChatRoom.objects.create(name="bench", created_by=user)
+        enabled = semantic_cache.enabled
+        semantic_cache.enabled = options["semantic_cache"]
+
+        try:
+            with tempfile.TemporaryDirectory() as directory, override_settings(
+                CHATBOT_PROVIDERS=self._providers(options),
+                CHATBOT_TRACING_ENABLED=options["real"]
+                and settings.CHATBOT_TRACING_ENABLED,
+            ):
+                VectorStoreManager._instance = None
+                manager = VectorStoreManager(directory)
+
+                started = time.perf_counter()
+                ingest = seed_vector_store(
+                    manager, directory, options["recipes"], options["seed"]
+                )
+                seed_seconds = time.perf_counter() - started
+
+                bot = Chatbot_Run()
+                results, errors, elapsed = asyncio.run(
+                    self._replay(bot, room, user, options)
+                )
+                stats = bot.embeddings.stats()
+                VectorStoreManager._instance = None
+        finally:
+            semantic_cache.enabled = enabled
+            user.delete()
+
+        report = {
+            "commit": current_commit(),
+            "config": {
+                key: options[key]
+                for key in (
+                    "recipes",
+                    "questions",
+                    "concurrency",
+                    "seed",
+                    "real",
+                    "embedding_latency",
+                    "llm_latency",
+                    "tokens_per_second",
+                    "semantic_cache",
+                )
+            },
+            "seed": {
+                "chunks": ingest["chunks"],
+                "seconds": round(seed_seconds, 2),
+            },
+            "stages": {
+                stage: percentiles([r[stage] for r in results if stage in r])
+                for stage in STAGES
+            },
+            "completed": len(results),
+            "errors": errors,
+            "seconds": round(elapsed, 2),
+            "throughput_qps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+            "rss_mb": rss_mb(),
+            "embedding_cache": stats,
+        }
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    async def _replay(self, bot, room, user, options):
+        questions = synthetic_questions(options["questions"], options["seed"])
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        results = []
+        errors = 0
+
+        async def run(index, question):
+            nonlocal errors
+            profile = PROFILES[index % len(PROFILES)]
+            async with semaphore:
+                # 작업마다 별도의 컨텍스트라 단계별 시간이 섞이지 않음
+                with collect_timings() as timings:
+                    started = time.perf_counter()
+                    try:
+                        response = await bot.ask(question, profile)
+                        with timed("persistence"):
+                            await save_turn(room, user, question, str(response.content))
+                    except Exception as e:
+                        errors += 1
+                        self.stderr.write(f"{question!r} failed: {e}")
+                        return
+                    timings["total"] = time.perf_counter() - started
+                results.append(timings)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(run(index, question) for index, question in enumerate(questions))
+        )
+        return results, errors, time.perf_counter() - started
@@ -0,0 +1,283 @@
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+    get_user_model,
+)
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from importlib import import_module
+import asyncio
+import json
+import tempfile
+import time
+import uuid
+
+from chatbot.benchmark import (
+    offline_providers,
+    percentiles,
+    rss_mb,
+    seed_vector_store,
+    synthetic_questions,
+)
+from chatbot.models import ChatMessage, ChatRoom
+
+
+# 이벤트 루프가 다른 작업에 막혀 늦게 깨어난 시간 측정
+async def monitor_loop_lag(samples, stop, interval=0.05):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(loop.time() - started - interval, 0.0))
+
+
+# 채팅방 N개를 ASGI 앱에 직접 연결해 메시지를 주고받는 부하 테스트 (오프라인)
+class Command(BaseCommand):
+    help = "Load-test ChatConsumer through the ASGI app with authenticated sessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=50)
+        parser.add_argument("--messages", type=int, default=5, help="Per room")
+        parser.add_argument(
+            "--history", type=int, default=20, help="Messages pre-seeded per room"
+        )
+        parser.add_argument("--stream", action="store_true")
+        parser.add_argument("--think-time", type=float, default=0.0)
+        parser.add_argument("--ramp", type=float, default=0.0, help="Seconds")
+        parser.add_argument("--timeout", type=float, default=60.0)
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--embedding-latency", type=float, default=0.05)
+        parser.add_argument("--llm-latency", type=float, default=0.3)
+        parser.add_argument("--tokens-per-second", type=float, default=60.0)
+        parser.add_argument("--output", help="Also write the JSON report to a file")
+
+    def handle(self, *args, **options):
+        providers = offline_providers(
+            options["embedding_latency"],
+            options["llm_latency"],
+            options["tokens_per_second"],
+        )
+        users, rooms = self._create_rooms(options)
+        sessions = []
+        try:
+            # 요약 작업은 예약하지 않음 (브로커 연결 대기가 응답 시간에 섞이고,
+            # 브로커가 있으면 실제 LLM을 쓰는 요약 작업이 쌓이므로)
+            with tempfile.TemporaryDirectory() as directory, override_settings(
+                CHATBOT_PROVIDERS=providers,
+                CHATBOT_TRACING_ENABLED=False,
+                CHATBOT_MEMORY={**settings.CHATBOT_MEMORY, "SUMMARY_ENABLED": False},
+            ):
+                # ASGI 앱(엔진 warm-up 포함)을 불러오기 전에 임시 벡터 DB 준비
+                from chatbot.chatbot import VectorStoreManager
+
+                VectorStoreManager._instance = None
+                seed_vector_store(
+                    VectorStoreManager(directory),
+                    directory,
+                    options["recipes"],
+                    options["seed"],
+                )
+                # 적재 중 캐시에 쓴 임베딩에 세션이 밀려나지 않도록 적재 후 로그인
+                sessions = [self._login(user) for user in users]
+                from chatbot.engine import engine
+                from config.asgi import application
+
+                # 이미 만든 엔진이 있으면 임시 벡터 DB로 다시 생성
+                engine.discard()
+                try:
+                    report = asyncio.run(
+                        self._run(application, sessions, rooms, options)
+                    )
+                finally:
+                    # 임시 디렉터리가 지워진 뒤 엔진/벡터 DB를 재사용하지 않도록 버림
+                    engine.discard()
+                    VectorStoreManager._instance = None
+        finally:
+            for session in sessions:
+                session.delete()
+            get_user_model().objects.filter(pk__in=[u.pk for u in users]).delete()
+
+        report["config"] = {
+            key: options[key]
+            for key in (
+                "rooms",
+                "messages",
+                "history",
+                "stream",
+                "think_time",
+                "ramp",
+                "embedding_latency",
+                "llm_latency",
+                "tokens_per_second",
+            )
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def _create_rooms(self, options):
+        user_model = get_user_model()
+        batch = uuid.uuid4().hex[:8]
+        users = []
+        for index in range(options["rooms"]):
+            user = user_model(
+                email=f"load-{batch}-{index}@example.com",
+                nickname=f"load-{batch}-{index}",
+            )
+            # 비밀번호 해시는 느리므로 로그인 불가 비밀번호 사용 (세션만 사용)
+            user.set_unusable_password()
+            users.append(user)
+        users = user_model.objects.bulk_create(users)
+
+        rooms = ChatRoom.objects.bulk_create(
+            ChatRoom(name=f"load-{index}", created_by=user)
+            for index, user in enumerate(users)
+        )
+        history = []
+        for room in rooms:
+            for index in range(options["history"]):
+                history.append(
+                    ChatMessage(
+                        room=room,
+                        user=room.created_by,
+                        message=f"이전 대화 {index} " * 10,
+                        message_type=(
+                            ChatMessage.USER_QUESTION
+                            if index % 2 == 0
+                            else ChatMessage.CHATBOT_RESPONSE
+                        ),
+                    )
+                )
+        ChatMessage.objects.bulk_create(history, batch_size=1000)
+        return users, rooms
+
+    # 로그인한 것과 같은 세션 생성 (AuthMiddlewareStack이 쿠키로 사용자 확인)
+    def _login(self, user):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    async def _run(self, application, sessions, rooms, options):
+        metrics = {
+            "connect": [],
+            "history_bytes": [],
+            "first_frame": [],
+            "turn": [],
+            "loop_lag": [],
+        }
+        counts = {
+            "connected": 0,
+            "failed": 0,
+            "messages": 0,
+            "errors": 0,
+            "queued": 0,  # 대기열을 거친 턴
+            "rejected": 0,  # 대기열이 가득 차 거절된 턴
+        }
+        questions = synthetic_questions(options["messages"] * 10, options["seed"])
+
+        async def drive(index, session, room):
+            await asyncio.sleep(options["ramp"] * index / max(len(rooms), 1))
+            cookie = f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+            communicator = WebsocketCommunicator(
+                application,
+                f"/ws/chatbot/{room.id}/",
+                headers=[(b"cookie", cookie.encode())],
+            )
+
+            started = time.perf_counter()
+            connected, _ = await communicator.connect(timeout=options["timeout"])
+            if not connected:
+                counts["failed"] += 1
+                return
+            history = await communicator.receive_from(timeout=options["timeout"])
+            metrics["connect"].append(time.perf_counter() - started)
+            metrics["history_bytes"].append(len(history.encode("utf-8")))
+            counts["connected"] += 1
+
+            try:
+                for turn in range(options["messages"]):
+                    message = questions[(index + turn) % len(questions)]
+                    await self._turn(communicator, message, options, metrics, counts)
+                    if options["think_time"]:
+                        await asyncio.sleep(options["think_time"])
+            finally:
+                await communicator.disconnect()
+
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(monitor_loop_lag(metrics["loop_lag"], stop))
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                drive(index, session, room)
+                for index, (session, room) in enumerate(zip(sessions, rooms))
+            )
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+
+        return {
+            "rooms": counts,
+            "seconds": round(elapsed, 2),
+            "messages_per_sec": round(counts["messages"] / elapsed, 2),
+            "connect": percentiles(metrics["connect"]),
+            "history_bytes": {
+                "mean": (
+                    round(sum(metrics["history_bytes"]) / len(metrics["history_bytes"]))
+                    if metrics["history_bytes"]
+                    else 0
+                ),
+                "max": max(metrics["history_bytes"], default=0),
+            },
+            "first_frame": percentiles(metrics["first_frame"]),
+            "turn": percentiles(metrics["turn"]),
+            "loop_lag": percentiles(metrics["loop_lag"]),
+            "rss_mb": rss_mb(),
+        }
+
+    async def _turn(self, communicator, message, options, metrics, counts):
+        sent = time.perf_counter()
+        await communicator.send_to(
+            text_data=json.dumps({"message": message, "stream": options["stream"]})
+        )
+
+        first = True
+        queued = False
+        while True:
+            frame = json.loads(
+                await communicator.receive_from(timeout=options["timeout"])
+            )
+            kind = frame.get("type")
+            # 대기 순번 알림은 답변이 아니므로 시간 측정에서 제외
+            if kind == "queued":
+                queued = True
+                continue
+            if kind == "busy":
+                counts["rejected"] += 1
+                return
+            if "error" in frame:
+                counts["errors"] += 1
+                return
+            is_answer = kind in ("chunk", "done") or frame.get("sender") == "chatbot"
+            if not is_answer:
+                continue
+            if first:
+                metrics["first_frame"].append(time.perf_counter() - sent)
+                first = False
+            # 스트리밍은 done 프레임, 일반 모드는 응답 프레임 하나로 끝남
+            if kind == "done" or (not options["stream"] and kind is None):
+                break
+
+        metrics["turn"].append(time.perf_counter() - sent)
+        counts["messages"] += 1
+        counts["queued"] += queued
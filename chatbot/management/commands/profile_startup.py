@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from collections import defaultdict
+import json
+import os
+import subprocess
+import sys
+
+
+# 새 인터프리터에서 단계별로 불러오며 시간/메모리 측정
+# (이 명령을 실행한 프로세스는 이미 많은 모듈을 불러온 상태라 따로 실행)
+CHILD_SCRIPT = """
+import importlib, json, sys, time
+import psutil
+
+process = psutil.Process()
+heavy = {heavy!r}
+stages = []
+
+def measure(name, load):
+    before = set(sys.modules)
+    rss = process.memory_info().rss
+    sys.stderr.write("profile-stage: " + name + "\\n")
+    sys.stderr.flush()
+    started = time.perf_counter()
+    load()
+    stages.append({{
+        "stage": name,
+        "seconds": round(time.perf_counter() - started, 3),
+        "rss_mb": round(process.memory_info().rss / 2**20, 1),
+        "rss_delta_mb": round((process.memory_info().rss - rss) / 2**20, 1),
+        "modules": len(set(sys.modules) - before),
+        "heavy": sorted(name for name in heavy if name in sys.modules and name not in before),
+    }})
+
+def setup():
+    import django
+    django.setup()
+
+def urlconf():
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+def warm_up():
+    from chatbot.engine import engine
+    engine.warm_up()
+
+measure("django.setup", setup)
+measure("urlconf", urlconf)
+for module in {modules!r}:
+    measure(module, lambda: importlib.import_module(module))
+if {warm_up!r}:
+    measure("engine.warm_up", warm_up)
+print(json.dumps(stages))
+"""
+
+# 챗봇 첫 사용 전에는 불러오지 않아야 하는 무거운 패키지
+HEAVY_PACKAGES = [
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "langchain_chroma",
+    "langchain_community",
+    "chromadb",
+    "langfuse",
+    "openai",
+    "onnxruntime",
+    "tiktoken",
+    "numpy",
+]
+
+
+# python -X importtime 출력을 단계별로 나눔
+def parse_importtime(stderr):
+    stage = None
+    rows = defaultdict(list)
+    for line in stderr.splitlines():
+        if line.startswith("profile-stage: "):
+            stage = line.split(": ", 1)[1]
+            continue
+        if not line.startswith("import time:") or stage is None:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        rows[stage].append(
+            (int(self_us), int(cumulative_us), name.rstrip(), name.strip())
+        )
+    return rows
+
+
+def summarize(rows, top):
+    packages = defaultdict(int)
+    for self_us, _, _, module in rows:
+        packages[module.split(".")[0]] += self_us
+    slowest = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest_imports_ms": [
+            {"module": module, "cumulative_ms": round(cumulative / 1000, 1)}
+            for _, cumulative, _, module in slowest
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = "Break down worker boot time and RSS per stage and per imported package"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            action="append",
+            dest="modules",
+            help="Extra module to import after the URLconf (repeatable)",
+        )
+        parser.add_argument(
+            "--warm-up", action="store_true", help="Also build the chatbot engine"
+        )
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument("--output", help="Also write the JSON report to a file")
+
+    def handle(self, *args, **options):
+        modules = options["modules"] or ["chatbot.routing"]
+        script = CHILD_SCRIPT.format(
+            heavy=HEAVY_PACKAGES, modules=modules, warm_up=options["warm_up"]
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "CHATBOT_WARM_UP_ON_STARTUP": "False"},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            self.stderr.write(result.stderr[-2000:])
+            raise SystemExit(result.returncode)
+
+        rows = parse_importtime(result.stderr)
+        stages = json.loads(result.stdout.strip().splitlines()[-1])
+        for stage in stages:
+            stage.update(summarize(rows[stage["stage"]], options["top"]))
+
+        report = {"python": sys.version.split()[0], "stages": stages}
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
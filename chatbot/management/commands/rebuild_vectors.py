@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+import time
+
+from chatbot.chatbot import VectorStoreManager
+
+
+# 벡터 DB를 처음부터 다시 생성 (청크 크기 등 적재 설정을 바꾼 뒤 실행)
+class Command(BaseCommand):
+    help = "Rebuild the recipe vector index, reusing stored chunk embeddings"
+
+    def handle(self, *args, **options):
+        manager = VectorStoreManager()
+        embeddings = manager.embeddings
+
+        started = time.perf_counter()
+        manager.rebuild()
+        elapsed = time.perf_counter() - started
+
+        stats = embeddings.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt in {elapsed:.1f}s: {stats['store_hits']} chunks from the "
+                f"embedding store, {stats['misses']} embedded through the API "
+                f"({len(embeddings.store)} vectors stored)"
+            )
+        )
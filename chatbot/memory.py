@@ -0,0 +1,187 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+import asyncio
+import copy
+import logging
+
+from .models import ChatMessage, ChatRoom
+from .prompts import SUMMARY_PROMPT
+from .providers import get_llm
+from .tokens import count_tokens, truncate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_LOCK_PREFIX = "chatbot:summary"
+SPEAKERS = {
+    ChatMessage.USER_QUESTION: "사용자",
+    ChatMessage.CHATBOT_RESPONSE: "챗봇",
+}
+
+
+def _line(msg):
+    return f"{SPEAKERS.get(msg.message_type, '시스템')}: {msg.message}"
+
+
+def _recent_query(room_id, before_id):
+    messages = ChatMessage.objects.filter(room_id=room_id).only(
+        "id", "message", "message_type", "created_at"
+    )
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    turns = settings.CHATBOT_MEMORY["RECENT_TURNS"]
+    return messages.order_by("-created_at", "-id")[: turns * 2]
+
+
+def _truncated(msg, max_tokens):
+    # 조회한 인스턴스는 저장하지 않지만 원본을 바꾸지 않도록 복사본을 자름
+    msg = copy.copy(msg)
+    msg.message = truncate_tokens(msg.message, max_tokens)
+    return msg
+
+
+# 토큰 예산 안에서 최근 대화를 그대로 가져옴 (최신 메시지부터 채움)
+# 가장 최근 질문/답변은 예산을 넘더라도 잘라서 남김 (긴 답변 하나로 맥락이 통째로 빠지지 않도록)
+def _trim_window(latest_first):
+    window = []
+    budget = settings.CHATBOT_MEMORY["RECENT_TOKENS"]
+    for index, msg in enumerate(latest_first):
+        tokens = count_tokens(_line(msg))
+        if tokens > budget:
+            if index >= 2:
+                break
+            # 최신 메시지는 예산의 절반까지만 써서 짝이 되는 메시지 자리를 남김
+            limit = budget // 2 if index == 0 and len(latest_first) > 1 else budget
+            prefix = tokens - count_tokens(msg.message)
+            msg = _truncated(msg, max(limit - prefix, 1))
+            tokens = count_tokens(_line(msg))
+        budget -= tokens
+        window.append(msg)
+    window.reverse()
+    return window
+
+
+def recent_messages(room_id, before_id=None):
+    return _trim_window(list(_recent_query(room_id, before_id)))
+
+
+def _render_conversation(summary, window):
+    parts = []
+    if summary:
+        parts.append(f"이전 대화 요약: {summary}")
+    parts.extend(_line(msg) for msg in window)
+    return "\n".join(parts)
+
+
+# 프롬프트에 넣을 대화 맥락 (방 요약 + 최근 대화)
+def build_conversation(room_id, before_id=None):
+    summary = (
+        ChatRoom.objects.filter(id=room_id).values_list("summary", flat=True).first()
+    )
+    return _render_conversation(summary, recent_messages(room_id, before_id))
+
+
+# WebSocket 소비자용 (비동기 ORM으로 조회)
+async def aload_conversation(room_id, before_id=None):
+    summary = (
+        await ChatRoom.objects.filter(id=room_id)
+        .values_list("summary", flat=True)
+        .afirst()
+    )
+    latest_first = [msg async for msg in _recent_query(room_id, before_id)]
+    return _render_conversation(summary, _trim_window(latest_first))
+
+
+# 요약 프롬프트 한 번에 넣을 만큼씩 메시지를 나눔 (예산보다 긴 메시지는 잘라서 넣음)
+def _summary_batches(messages, max_tokens):
+    batch, used = [], 0
+    for msg in messages:
+        line = truncate_tokens(_line(msg), max_tokens)
+        tokens = count_tokens(line) + 1
+        if batch and used + tokens > max_tokens:
+            yield batch
+            batch, used = [], 0
+        batch.append((msg, line))
+        used += tokens
+    if batch:
+        yield batch
+
+
+# 최근 대화 창 밖으로 밀려난 메시지를 방 요약에 합침 (Celery 작업에서 실행)
+# 밀린 메시지가 많아도 모델 입력 한도를 넘지 않도록 나눠서 합치고, 한 묶음마다 진행 위치를 저장
+def update_summary(room_id):
+    room = ChatRoom.objects.filter(id=room_id).first()
+    window = recent_messages(room_id)
+    if room is None or not window:
+        return None
+
+    older = ChatMessage.objects.filter(room_id=room_id, id__lt=window[0].id)
+    if room.summary_message_id:
+        older = older.filter(id__gt=room.summary_message_id)
+    older = list(older.order_by("created_at", "id"))
+    if not older:
+        return room.summary
+
+    config = settings.CHATBOT_MEMORY
+    llm = get_llm({**settings.CHATBOT_LLM_CONFIG, "temperature": 0})
+    summary, summary_message_id = room.summary, room.summary_message_id
+    for batch in _summary_batches(older, config["SUMMARY_BATCH_TOKENS"]):
+        response = llm.invoke(
+            SUMMARY_PROMPT.format(
+                summary=summary or "없음",
+                conversation="\n".join(line for _, line in batch),
+                max_tokens=config["SUMMARY_TOKENS"],
+            )
+        )
+        summary = str(response.content).strip()
+
+        # 요약 중 다른 작업이 먼저 끝났으면 더 최신 요약을 덮어쓰지 않음
+        updated = ChatRoom.objects.filter(
+            id=room_id, summary_message_id=summary_message_id
+        ).update(summary=summary, summary_message_id=batch[-1][0].id)
+        if not updated:
+            return None
+        summary_message_id = batch[-1][0].id
+        logger.info("room %s: %d messages folded into summary", room_id, len(batch))
+    return summary
+
+
+# 답변 저장 후 요약 작업 예약 (같은 방의 작업은 잠깐 동안 한 번만 예약)
+def queue_summary(room_id):
+    from .tasks import summarize_room
+
+    key = f"{SUMMARY_LOCK_PREFIX}:{room_id}"
+    if not cache.add(key, True, timeout=settings.CHATBOT_MEMORY["SUMMARY_DEBOUNCE"]):
+        return
+    try:
+        # 브로커가 없을 때 재시도하며 소비자를 붙잡지 않도록 바로 실패시킴
+        summarize_room.apply_async((room_id,), retry=False)
+    # 브로커 장애로 요약이 밀려도 채팅 응답에는 영향을 주지 않음
+    # (잠금은 그대로 두어 장애 중에는 방마다 debounce 간격으로만 재시도)
+    except Exception as e:
+        logger.warning("room %s: failed to queue summary: %s", room_id, e)
+
+
+# 브로커 연결을 기다리는 동안 다른 소비자의 DB 작업이 막히지 않도록 별도 스레드에서 실행
+aqueue_summary = sync_to_async(queue_summary, thread_sensitive=False)
+
+# 예약 중인 작업 (참조가 없으면 끝나기 전에 가비지 컬렉션될 수 있음)
+_summary_tasks = set()
+
+
+def _summary_done(task):
+    _summary_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("failed to queue summary", exc_info=task.exception())
+
+
+# 요약 예약을 기다리지 않음 (브로커 장애 때도 같은 연결의 다음 메시지가 밀리지 않도록)
+def schedule_summary(room_id):
+    if not settings.CHATBOT_MEMORY["SUMMARY_ENABLED"]:
+        return None
+    task = asyncio.create_task(aqueue_summary(room_id))
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_done)
+    return task
@@ -0,0 +1,292 @@
+from django.core.cache import cache
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+import logging
+import os
+import socket
+import time
+
+from .timing import collect_timings
+
+
+logger = logging.getLogger(__name__)
+
+# 워커 프로세스 단위 메트릭 (Prometheus 텍스트 형식으로 내보냄)
+# gunicorn 워커가 여러 개면 /metrics 요청은 임의의 워커 하나로만 가므로
+# 각 워커가 주기적으로 Redis에 값을 올리고, /metrics는 살아있는 모든 워커의 값을 합쳐서 내보냄
+METRICS_CACHE_PREFIX = "chatbot:metrics"
+PROCESS_INDEX_KEY = f"{METRICS_CACHE_PREFIX}:processes"
+PUBLISH_INTERVAL = 15  # 초
+PROCESS_TTL = 120  # 이 시간 동안 값을 올리지 않은 워커(종료된 프로세스)는 합계에서 제외
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)  # fmt: skip
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    # 여러 워커의 같은 라벨 값을 합침
+    def merge(self, value, other):
+        return value + other
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self, values=None):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if values is None:
+            values = self.snapshot()
+        for labels, value in sorted(values.items()):
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{_label_text(labels)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, observations = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, observations + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                labels: (list(counts), total, observations)
+                for labels, (counts, total, observations) in self._values.items()
+            }
+
+    def merge(self, value, other):
+        return (
+            [a + b for a, b in zip(value[0], other[0])],
+            value[1] + other[1],
+            value[2] + other[2],
+        )
+
+    def _render_value(self, labels, value):
+        counts, total, observations = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            bucket_labels = labels + (("le", _number(float(bound))),)
+            lines.append(f"{self.name}_bucket{_label_text(bucket_labels)} {cumulative}")
+        inf_labels = labels + (("le", "+Inf"),)
+        lines.append(f"{self.name}_bucket{_label_text(inf_labels)} {observations}")
+        lines.append(f"{self.name}_sum{_label_text(labels)} {_number(total)}")
+        lines.append(f"{self.name}_count{_label_text(labels)} {observations}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "chatbot_stage_seconds", "Time spent in each stage of a chat turn"
+)
+TURN_SECONDS = Histogram("chatbot_turn_seconds", "Total time of a chat turn")
+LLM_TOKENS = Counter(
+    "chatbot_llm_tokens_total", "Tokens sent to and received from the LLM"
+)
+TURN_ERRORS = Counter("chatbot_turn_errors_total", "Chat turns that failed")
+WEBSOCKET_CONNECTIONS = Gauge(
+    "chatbot_websocket_connections", "Open chat WebSocket connections"
+)
+LLM_INFLIGHT = Gauge("chatbot_llm_inflight", "LLM calls currently running")
+COALESCED_TURNS = Counter(
+    "chatbot_coalesced_turns_total",
+    "Chat turns that joined an identical question already being answered",
+)
+ADMISSION_QUEUE = Gauge("chatbot_admission_queue", "Chat turns waiting for an LLM slot")
+ADMISSION_REJECTED = Counter(
+    "chatbot_admission_rejected_total", "Chat turns rejected because the queue was full"
+)
+PROFILE_CACHE = Counter(
+    "chatbot_profile_cache_total", "User profile lookups by the layer that served them"
+)
+SEMANTIC_CACHE = Counter(
+    "chatbot_semantic_cache_total", "Semantic answer cache lookups by result"
+)
+CONTEXT_TOKENS = Counter(
+    "chatbot_context_tokens_total",
+    "Recipe context tokens retrieved and actually sent in the prompt",
+)
+
+REGISTRY = [
+    STAGE_SECONDS,
+    TURN_SECONDS,
+    LLM_TOKENS,
+    TURN_ERRORS,
+    WEBSOCKET_CONNECTIONS,
+    LLM_INFLIGHT,
+    COALESCED_TURNS,
+    ADMISSION_QUEUE,
+    ADMISSION_REJECTED,
+    PROFILE_CACHE,
+    SEMANTIC_CACHE,
+    CONTEXT_TOKENS,
+]
+
+
+def _process_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _process_key(process_id):
+    return f"{METRICS_CACHE_PREFIX}:process:{process_id}"
+
+
+def snapshot_metrics():
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+# 이 프로세스의 메트릭을 Redis에 올림
+def publish_metrics():
+    process_id = _process_id()
+    cache.set(_process_key(process_id), snapshot_metrics(), timeout=PROCESS_TTL)
+
+    # 워커 목록은 여러 프로세스가 함께 고치므로, 덮어써서 빠진 워커는 다음 주기에 다시 등록됨
+    now = time.time()
+    processes = cache.get(PROCESS_INDEX_KEY) or {}
+    if now - processes.get(process_id, 0) >= PROCESS_TTL / 2:
+        processes = {
+            other: seen for other, seen in processes.items() if now - seen < PROCESS_TTL
+        }
+        processes[process_id] = now
+        cache.set(PROCESS_INDEX_KEY, processes, timeout=None)
+
+
+def _publish_forever():
+    while True:
+        time.sleep(PUBLISH_INTERVAL)
+        try:
+            publish_metrics()
+        except Exception as e:
+            logger.warning("Failed to publish metrics: %s", e)
+
+
+_publisher_pid = None
+_publisher_lock = Lock()
+
+
+# 프로세스마다 한 번 백그라운드 스레드 시작 (fork된 워커는 pid가 달라 새로 시작)
+def start_publisher():
+    global _publisher_pid
+
+    with _publisher_lock:
+        if _publisher_pid == os.getpid():
+            return
+        _publisher_pid = os.getpid()
+    Thread(target=_publish_forever, name="metrics-publisher", daemon=True).start()
+
+
+def _aggregate(metric, snapshots):
+    values = {}
+    for snapshot in snapshots:
+        for labels, value in snapshot.get(metric.name, {}).items():
+            values[labels] = (
+                metric.merge(values[labels], value) if labels in values else value
+            )
+    return values
+
+
+# 모든 워커의 메트릭 합계 (Redis를 쓸 수 없으면 이 프로세스 값만)
+def render_metrics():
+    start_publisher()
+    try:
+        publish_metrics()
+        processes = cache.get(PROCESS_INDEX_KEY) or {}
+        snapshots = list(
+            cache.get_many([_process_key(process) for process in processes]).values()
+        )
+    except Exception as e:
+        logger.warning("Failed to aggregate metrics from other workers: %s", e)
+        snapshots = [snapshot_metrics()]
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(_aggregate(metric, snapshots)))
+    return "\n".join(lines) + "\n"
+
+
+# 채팅 한 턴의 단계별 시간을 모아 턴이 끝날 때 히스토그램에 기록
+@contextmanager
+def track_turn(mode):
+    start_publisher()
+    with collect_timings() as timings:
+        started = time.perf_counter()
+        try:
+            yield timings
+        except Exception:
+            TURN_ERRORS.inc(mode=mode)
+            raise
+        finally:
+            for stage, seconds in timings.items():
+                STAGE_SECONDS.observe(seconds, stage=stage)
+            TURN_SECONDS.observe(time.perf_counter() - started, mode=mode)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0005_remove_chatmessage_is_bot_chatmessage_message_type_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="embedded_chunks",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="total_chunks",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0006_recipe_embedded_chunks_recipe_total_chunks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="embedding_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="embedding_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "대기"),
+                    ("queued", "예약됨"),
+                    ("running", "임베딩 중"),
+                    ("done", "완료"),
+                    ("failed", "실패"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="embedding_task_id",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0007_recipe_embedding_error_recipe_embedding_status_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["room", "created_at", "id"], name="chatmsg_room_created_idx"
+            ),
+        ),
+    ]
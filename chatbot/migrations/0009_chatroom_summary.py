@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0008_chatmessage_room_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatroom",
+            name="summary",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="summary_message_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
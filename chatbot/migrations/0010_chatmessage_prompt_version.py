@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot", "0009_chatroom_summary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmessage",
+            name="prompt_version",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -6,15 +6,47 @@ User = get_user_model()
 
 
 class Recipe(models.Model):
+    # 임베딩 작업 상태
+    STATUS_PENDING = "pending"
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "대기"),
+        (STATUS_QUEUED, "예약됨"),
+        (STATUS_RUNNING, "임베딩 중"),
+        (STATUS_DONE, "완료"),
+        (STATUS_FAILED, "실패"),
+    ]
+
     csv_file = models.FileField(upload_to="csv_file/")
     is_embedded = models.BooleanField(default=False)
 
+    # 임베딩 진행률 (중단 시 embedded_chunks 이후부터 이어서 진행)
+    embedded_chunks = models.IntegerField(default=0)
+    total_chunks = models.IntegerField(null=True, blank=True)
+
+    embedding_status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    embedding_error = models.TextField(blank=True)
+    embedding_task_id = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return self.csv_file.name
+
 
 class ChatRoom(models.Model):
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    # 최근 대화 창 밖으로 밀려난 메시지의 요약 (summary_message_id까지 반영됨)
+    summary = models.TextField(blank=True)
+    summary_message_id = models.BigIntegerField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.name} (Created by {self.created_by.username})"
 
@@ -51,10 +83,19 @@ class ChatMessage(models.Model):
         related_name="responses",
     )
 
+    # 답변을 만든 Langfuse 프롬프트 버전 (기본 프롬프트면 None)
+    prompt_version = models.PositiveIntegerField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # 채팅 기록 키셋 페이지네이션용
+            models.Index(
+                fields=["room", "created_at", "id"], name="chatmsg_room_created_idx"
+            ),
+        ]
 
     def __str__(self):
         message_preview = (
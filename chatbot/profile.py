@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from accounts.models import Allergy, PreferredCuisine, User
+
+from .metrics import PROFILE_CACHE
+
+
+PROFILE_CACHE_PREFIX = "chatbot:profile"
+GENDERS = dict(User.GENDER_CHOICES)
+
+
+# 프롬프트에 넣을 사용자 정보 (이메일/사진 등 답변과 무관한 값은 넣지 않음)
+def render_profile(profile):
+    lines = []
+    if profile.get("nickname"):
+        lines.append(f"닉네임: {profile['nickname']}")
+    if profile.get("age"):
+        lines.append(f"나이: {profile['age']}")
+    if profile.get("gender"):
+        lines.append(f"성별: {GENDERS.get(profile['gender'], profile['gender'])}")
+    lines.append(f"알러지: {', '.join(profile.get('allergies') or []) or '없음'}")
+    if profile.get("preferred_cuisine"):
+        lines.append(f"선호 음식: {', '.join(profile['preferred_cuisine'])}")
+    lines.append(f"다이어트 중: {'예' if profile.get('diet') else '아니오'}")
+    return "\n".join(lines)
+
+
+# 답변을 바꾸는 사용자 정보 (답변 캐시를 여러 사용자가 함께 쓰는 기준)
+SHARED_PROFILE_FIELDS = ("allergies", "preferred_cuisine", "diet")
+
+
+# 캐시할 답변용 프롬프트에는 닉네임/나이/성별을 넣지 않음 (다른 사용자에게 그대로 재사용되므로)
+def shared_profile_prompt(user_data):
+    return render_profile(
+        {field: user_data.get(field) for field in SHARED_PROFILE_FIELDS}
+    )
+
+
+# 스냅샷에 저장된 프롬프트가 없으면(벤치마크용 사용자 정보 등) 바로 만듦
+def profile_prompt(user_data):
+    return user_data.get("prompt") or render_profile(user_data)
+
+
+# DB에서 사용자 정보를 읽어 프롬프트에 바로 쓸 수 있는 형태로 만듦
+async def abuild_profile(user_id):
+    profile = (
+        await User.objects.filter(pk=user_id)
+        .values("nickname", "age", "gender", "diet")
+        .afirst()
+    )
+    if profile is None:
+        return None
+    profile["allergies"] = sorted(
+        [
+            name
+            async for name in Allergy.objects.filter(user=user_id).values_list(
+                "ingredient", flat=True
+            )
+        ]
+    )
+    profile["preferred_cuisine"] = sorted(
+        [
+            name
+            async for name in PreferredCuisine.objects.filter(user=user_id).values_list(
+                "cuisine", flat=True
+            )
+        ]
+    )
+    profile["prompt"] = render_profile(profile)
+    return profile
+
+
+# 사용자 정보 스냅샷을 프로세스 메모리(LRU)와 Redis에 2단계로 캐싱
+# 프로필이 바뀌면 Redis 항목을 지우고, 다른 워커의 메모리 항목은 LOCAL_TTL 안에 만료됨
+class ProfileCache:
+    def __init__(self, config=None):
+        config = {**settings.CHATBOT_PROFILE_CACHE, **(config or {})}
+        self.local_size = config["LOCAL_SIZE"]
+        self.local_ttl = config["LOCAL_TTL"]
+        self.ttl = config["TTL"]
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    def _key(self, user_id):
+        return f"{PROFILE_CACHE_PREFIX}:{user_id}"
+
+    def _get_local(self, user_id):
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.local_ttl:
+                del self._local[user_id]
+                return None
+            self._local.move_to_end(user_id)
+            return entry[1]
+
+    def _set_local(self, user_id, profile):
+        with self._lock:
+            self._local[user_id] = (time.monotonic(), profile)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    # 메모리 → Redis → DB 순서로 조회
+    async def aget(self, user_id):
+        profile = self._get_local(user_id)
+        if profile is not None:
+            PROFILE_CACHE.inc(layer="local")
+            return profile
+
+        profile = await cache.aget(self._key(user_id))
+        if profile is not None:
+            PROFILE_CACHE.inc(layer="redis")
+        else:
+            profile = await abuild_profile(user_id)
+            if profile is None:
+                return {}
+            PROFILE_CACHE.inc(layer="db")
+            await cache.aset(self._key(user_id), profile, timeout=self.ttl)
+        self._set_local(user_id, profile)
+        return profile
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+        cache.delete_many([self._key(user_id) for user_id in user_ids])
+
+
+profile_cache = ProfileCache()
+
+
+# 트랜잭션이 커밋된 뒤에 지워야 다른 요청이 변경 전 값을 다시 캐시하지 않음
+def invalidate_profile(*user_ids):
+    if user_ids:
+        transaction.on_commit(lambda: profile_cache.invalidate(*user_ids))
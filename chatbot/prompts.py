@@ -0,0 +1,194 @@
+from django.conf import settings
+from langchain_core.prompts import ChatPromptTemplate
+
+from contextvars import ContextVar
+from threading import Lock, Thread
+import json
+import logging
+import os
+import time
+
+from .tracing import get_langfuse
+
+
+logger = logging.getLogger(__name__)
+
+
+# Langfuse를 쓸 수 없을 때 사용하는 기본 프롬프트
+DEFAULT_PROMPT = """당신은 레시피 추천 챗봇 TastePT입니다.
+아래 레시피 정보와 사용자 정보를 참고해서 질문에 한국어로 답변하세요.
+사용자의 알러지 재료가 들어간 레시피는 추천하지 마세요.
+레시피 정보에 없는 내용은 지어내지 말고 모른다고 답변하세요.
+
+레시피 정보:
+{recipes}
+
+사용자 정보:
+{user_data}
+
+이전 대화:
+{conversation}
+
+질문: {question}
+"""
+
+# 대화 맥락 변수가 없는 Langfuse 프롬프트 앞에 붙이는 시스템 메시지
+CONVERSATION_PROMPT = """이전 대화 (후속 질문을 이해하는 데만 참고하세요):
+{conversation}"""
+
+# 오래된 대화를 방 요약에 합칠 때 쓰는 프롬프트
+SUMMARY_PROMPT = """다음은 레시피 추천 챗봇과 사용자의 대화입니다.
+기존 요약과 새 대화를 합쳐 {max_tokens}토큰 이내의 한국어 요약으로 다시 작성하세요.
+사용자의 취향, 이미 추천받은 요리, 진행 중인 요청처럼 다음 답변에 필요한 내용만 남기세요.
+
+기존 요약:
+{summary}
+
+새 대화:
+{conversation}
+
+요약:"""
+
+
+def with_conversation(prompt):
+    if "conversation" in prompt.input_variables:
+        return prompt
+    combined = ChatPromptTemplate.from_messages(
+        [("system", CONVERSATION_PROMPT), *prompt.messages]
+    )
+    # Langfuse 트레이스에 프롬프트 버전이 연결되도록 메타데이터 유지
+    combined.metadata = prompt.metadata
+    return combined
+
+
+def compile_prompt(template, langfuse_prompt=None):
+    metadata = {"langfuse_prompt": langfuse_prompt} if langfuse_prompt else None
+    prompt = ChatPromptTemplate.from_template(template, metadata=metadata)
+    return with_conversation(prompt)
+
+
+# 이번 턴의 답변을 만든 프롬프트 버전 (ChatMessage에 함께 저장)
+served_prompt_version = ContextVar("served_prompt_version", default=None)
+
+
+# Langfuse 프롬프트 캐시
+# 요청 처리 중에는 메모리의 프롬프트만 사용하고, TTL이 지나면 백그라운드 스레드에서 갱신
+# 마지막으로 받은 프롬프트는 디스크에 저장해 재시작/Langfuse 장애 때도 그대로 사용
+class PromptCache:
+    def __init__(self, name=None):
+        self.name = name or settings.CHATBOT_PROMPT_NAME
+        self._lock = Lock()
+        # (ChatPromptTemplate, 버전)을 한 번에 교체해 갱신 스레드와 섞여 읽히지 않도록 함
+        self._current = None
+        self.source = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._thread = None
+
+    @property
+    def path(self):
+        return os.path.join(
+            settings.CHATBOT_PROMPT_CACHE["DIRECTORY"], f"{self.name}.json"
+        )
+
+    @property
+    def version(self):
+        current = self._current
+        return current[1] if current else None
+
+    # (ChatPromptTemplate, 프롬프트 버전) 반환, 기본 프롬프트의 버전은 None
+    def get(self):
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._load_local()
+        if time.monotonic() - self._checked_at >= settings.CHATBOT_PROMPT_CACHE["TTL"]:
+            self._refresh_in_background()
+        return self._current
+
+    # 디스크에 저장된 마지막 프롬프트, 없으면 기본 프롬프트
+    def _load_local(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self._set(compile_prompt(data["template"]), data["version"], "disk")
+        except (OSError, ValueError, KeyError):
+            logger.warning(
+                "No saved copy of prompt %r, using the built-in default", self.name
+            )
+            self._set(ChatPromptTemplate.from_template(DEFAULT_PROMPT), None, "default")
+
+    def _set(self, prompt, version, source):
+        self._current = (prompt, version)
+        self.source = source
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or get_langfuse() is None:
+                return
+            self._refreshing = True
+            self._thread = Thread(
+                target=self.refresh, name="prompt-refresh", daemon=True
+            )
+        self._thread.start()
+
+    # 첫 배포처럼 디스크 사본이 없으면 기본 프롬프트로 답하지 않도록 Langfuse 프롬프트를 기다려서 받음
+    def warm_up(self, timeout=None):
+        if timeout is None:
+            timeout = settings.CHATBOT_PROMPT_CACHE["WARM_UP_TIMEOUT"]
+        self.get()
+        if self.source == "default":
+            self._refresh_in_background()
+            if self._thread is not None:
+                self._thread.join(timeout)
+        if self.source == "default":
+            logger.error(
+                "Prompt %r is not available from Langfuse (timeout %ss); "
+                "answering with the built-in DEFAULT_PROMPT",
+                self.name,
+                timeout,
+            )
+        return self.source
+
+    # Langfuse에서 프롬프트를 받아 교체 (실패하면 기존 프롬프트 유지)
+    def refresh(self):
+        langfuse = get_langfuse()
+        try:
+            if langfuse is None:
+                return False
+            langfuse_prompt = langfuse.get_prompt(self.name)
+            template = langfuse_prompt.get_langchain_prompt()
+            version = getattr(langfuse_prompt, "version", None)
+            prompt = compile_prompt(template, langfuse_prompt)
+        except Exception as e:
+            logger.warning(
+                "Failed to refresh prompt %r from Langfuse: %s", self.name, e
+            )
+            return False
+        finally:
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+
+        if version != self.version or self.source != "langfuse":
+            logger.info("Prompt %r version %s loaded", self.name, version)
+        self._set(prompt, version, "langfuse")
+        try:
+            self._save(template, version)
+        except OSError as e:
+            logger.warning("Failed to save prompt %r: %s", self.name, e)
+        return True
+
+    def _save(self, template, version):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 쓰는 도중 종료돼도 기존 파일이 깨지지 않도록 임시 파일에 쓴 뒤 교체
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"name": self.name, "version": version, "template": template},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(temp_path, self.path)
+
+
+prompt_cache = PromptCache()
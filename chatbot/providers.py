@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from langchain_core.embeddings import Embeddings
+
+import os
+
+import numpy as np
+
+
+# 로컬 ONNX MiniLM 임베딩 (sentence-transformers/all-MiniLM-L6-v2 export)
+# model_dir에 model.onnx, tokenizer.json 필요
+class OnnxMiniLMEmbeddings(Embeddings):
+
+    def __init__(self, model_dir, max_length=256, batch_size=32):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {
+            model_input.name for model_input in self.session.get_inputs()
+        }
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, inputs)[0]
+
+        # 패딩을 제외한 토큰 평균 + L2 정규화 (sentence-transformers와 동일)
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).tolist()
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start : start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# 임베딩 제공자: (임베딩 객체, 모델 이름) 반환
+def _openai_embeddings(config):
+    from langchain_openai import OpenAIEmbeddings
+
+    model = "text-embedding-ada-002"
+    return OpenAIEmbeddings(model=model), model
+
+
+def _onnx_embeddings(config):
+    return OnnxMiniLMEmbeddings(config["ONNX_MODEL_DIR"]), "all-MiniLM-L6-v2"
+
+
+def _fake_embeddings(config):
+    from .fakes import FakeEmbeddings
+
+    fake = config["FAKE"]
+    embeddings = FakeEmbeddings(
+        dim=fake["EMBEDDING_DIM"], latency=fake["EMBEDDING_LATENCY"]
+    )
+    return embeddings, f"fake-{fake['EMBEDDING_DIM']}"
+
+
+# LLM 제공자: CHATBOT_LLM_CONFIG(model_name, temperature 등)로 생성
+def _openai_llm(config, llm_config):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(**llm_config)
+
+
+def _fake_llm(config, llm_config):
+    from .fakes import FakeChatModel
+
+    fake = config["FAKE"]
+    return FakeChatModel(
+        model_name=llm_config.get("model_name", "fake-chat"),
+        temperature=llm_config.get("temperature", 0.0),
+        latency=fake["LLM_LATENCY"],
+        tokens_per_second=fake["TOKENS_PER_SECOND"],
+        response_tokens=fake["RESPONSE_TOKENS"],
+    )
+
+
+EMBEDDING_PROVIDERS = {
+    "openai": _openai_embeddings,
+    "onnx": _onnx_embeddings,
+    "fake": _fake_embeddings,
+}
+
+LLM_PROVIDERS = {
+    "openai": _openai_llm,
+    "fake": _fake_llm,
+}
+
+
+def _provider(registry, name):
+    if name not in registry:
+        raise ImproperlyConfigured(
+            f"Unknown chatbot provider {name!r} (choices: {', '.join(registry)})"
+        )
+    return registry[name]
+
+
+def get_embeddings(name=None):
+    config = settings.CHATBOT_PROVIDERS
+    return _provider(EMBEDDING_PROVIDERS, name or config["EMBEDDING"])(config)
+
+
+def get_llm(llm_config, name=None):
+    config = settings.CHATBOT_PROVIDERS
+    return _provider(LLM_PROVIDERS, name or config["LLM"])(config, llm_config)
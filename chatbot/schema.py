@@ -31,3 +31,18 @@ class ChatbotResponseSchema(Schema):
 
 class ErrorSchema(Schema):
     detail: str
+
+
+class EngineReloadSchema(Schema):
+    model_name: str = None
+    temperature: float = None
+
+
+class EngineStatusSchema(Schema):
+    ready: bool
+    version: int
+    llm_config: dict
+    prompt_version: int = None
+    warmup_ms: float = None
+    loaded_at: float = None
+    embedding_cache: dict = None
@@ -0,0 +1,39 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+
+from .profile import invalidate_profile
+
+
+PROFILE_M2M_FIELDS = {
+    User.allergies.through: "allergies",
+    User.preferred_cuisine.through: "preferred_cuisine",
+}
+
+
+# 닉네임/나이/성별/다이어트 여부는 어디서 저장하든(관리자 페이지, 셸 등) 캐시를 지움
+# (QuerySet.update는 시그널이 없으므로 invalidate_profile을 직접 호출해야 함)
+@receiver(post_save, sender=User)
+def invalidate_profile_on_save(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_profile(instance.pk)
+
+
+# 알러지/선호 음식이 바뀌면 챗봇 사용자 정보 캐시를 지움
+@receiver(m2m_changed, sender=User.allergies.through)
+@receiver(m2m_changed, sender=User.preferred_cuisine.through)
+def invalidate_profile_on_m2m_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_profile(instance.pk)
+    elif action in ("post_add", "post_remove"):
+        # 알러지/음식 쪽에서 바꾼 경우 pk_set이 사용자 id
+        invalidate_profile(*pk_set)
+    elif action == "pre_clear":
+        # clear 후에는 연결됐던 사용자를 알 수 없으므로 미리 조회
+        field = PROFILE_M2M_FIELDS[sender]
+        user_ids = User.objects.filter(**{field: instance}).values_list("pk", flat=True)
+        invalidate_profile(*user_ids)
@@ -0,0 +1,95 @@
+from weakref import WeakKeyDictionary
+import asyncio
+import hashlib
+import re
+
+from .metrics import COALESCED_TURNS
+
+
+# 공백/대소문자/끝 문장부호만 다른 질문은 같은 질문으로 취급
+def normalize_question(question):
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+
+def flight_key(question, fingerprint, conversation=""):
+    raw = "\0".join([normalize_question(question), fingerprint, conversation])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# 진행 중인 생성 작업 하나 (토큰을 모아 두고 구독자마다 처음부터 다시 흘려보냄)
+class Flight:
+    def __init__(self, source):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self._changed = asyncio.Event()
+        self.subscribers = 0
+        # 처음 요청한 연결이 끊겨도 다른 구독자가 남아 있으면 끝까지 실행
+        self.task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._wake()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._wake()
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self):
+        index = 0
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            # 모든 구독자가 떠나면 생성을 멈춤 (받을 사람이 없는 답변이 LLM 자리 밖에서 돌지 않도록)
+            if not self.subscribers and not self.finished:
+                self.task.cancel()
+
+
+# 같은 질문이 동시에 들어오면 검색/생성을 한 번만 수행해 결과 토큰을 공유
+# 진행 중인 동안만 공유하고 끝나면 바로 버리므로 오래된 답변을 돌려줄 일이 없음
+class SingleFlight:
+    def __init__(self):
+        # 이벤트 루프마다 따로 관리 (API 요청은 요청마다 새 루프에서 실행될 수 있음)
+        self._flights = WeakKeyDictionary()
+
+    def in_flight(self):
+        flights = self._flights.get(asyncio.get_running_loop(), {})
+        return len(flights)
+
+    async def stream(self, key, source_factory):
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = Flight(source_factory())
+
+            def forget(task):
+                if flights.get(key) is flight:
+                    del flights[key]
+
+            flight.task.add_done_callback(forget)
+        else:
+            COALESCED_TURNS.inc()
+
+        async for chunk in flight.subscribe():
+            yield chunk
+
+
+single_flight = SingleFlight()
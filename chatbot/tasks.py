@@ -0,0 +1,50 @@
+from celery import shared_task
+
+from .models import Recipe
+
+
+# 레시피 CSV 임베딩 (embedding 큐 전용 워커에서 실행)
+@shared_task(bind=True)
+def embed_recipe(self, recipe_id):
+    from .cache import semantic_cache
+    from .chatbot import VectorStoreManager
+
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or recipe.is_embedded:
+        return
+
+    Recipe.objects.filter(id=recipe_id).update(
+        embedding_status=Recipe.STATUS_RUNNING, embedding_error=""
+    )
+
+    # 배치가 끝날 때마다 작업 상태에도 진행률 기록
+    def on_progress(embedded, total):
+        self.update_state(
+            state="PROGRESS", meta={"embedded_chunks": embedded, "total_chunks": total}
+        )
+
+    try:
+        stats = VectorStoreManager().add_recipe(recipe, on_progress=on_progress)
+    except Exception as e:
+        Recipe.objects.filter(id=recipe_id).update(
+            embedding_status=Recipe.STATUS_FAILED, embedding_error=str(e)
+        )
+        raise
+
+    Recipe.objects.filter(id=recipe_id).update(embedding_status=Recipe.STATUS_DONE)
+
+    # 레시피 인덱스가 바뀌었으므로 캐시된 답변 무효화
+    semantic_cache.invalidate()
+    return stats
+
+
+# 방의 오래된 대화를 요약에 합침 (답변 후 백그라운드에서 실행)
+@shared_task(ignore_result=True)
+def summarize_room(room_id):
+    from django.core.cache import cache
+
+    from .memory import SUMMARY_LOCK_PREFIX, update_summary
+
+    # 실행을 시작하면 다음 답변부터 다시 예약할 수 있도록 잠금 해제
+    cache.delete(f"{SUMMARY_LOCK_PREFIX}:{room_id}")
+    update_summary(room_id)
@@ -1,3 +1,1746 @@
-from django.test import TestCase
+from io import BytesIO, StringIO
+from unittest import mock
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from accounts.models import Allergy, PreferredCuisine
+from accounts.serializers import ProfileUpdateSerializer
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from kombu.exceptions import OperationalError
+from langchain_core.messages import AIMessage
+import chromadb
+import redis
+
+from .admin import queue_embedding
+from .admission import AdmissionController, QueueFull
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .cache import SemanticAnswerCache, profile_fingerprint
+from .chatbot import Chatbot_Run, VectorStoreManager
+from .consumers import ChatConsumer
+from .context import build_context, merge_chunks
+from .embedding_store import EmbeddingStore
+from .embeddings import CachedEmbeddings
+from .engine import ChatbotEngine
+from .fakes import FakeChatModel, FakeEmbeddings
+from .history import decode_cursor, fetch_history_page
+from .ingestion import RecipeIngestor, iter_csv_documents
+from .ingredients import allergy_filter, passes_allergy_filter, recipe_metadata
+from .memory import (
+    build_conversation,
+    recent_messages,
+    schedule_summary,
+    update_summary,
+)
+from . import memory
+from .llm_metrics import LLMMetricsHandler
+from .metrics import (
+    Counter,
+    Histogram,
+    LLM_INFLIGHT,
+    SEMANTIC_CACHE,
+    publish_metrics,
+    render_metrics,
+    track_turn,
+)
+from .models import ChatMessage, ChatRoom, Recipe
+from .profile import ProfileCache, render_profile
+from .prompts import PromptCache, prompt_cache
+from .providers import get_embeddings, get_llm
+from .singleflight import SingleFlight, flight_key
+from .tasks import embed_recipe, summarize_room
+from .timing import collect_timings, record_timing, timed
+from .tokens import count_tokens
+from . import tokens
+
+
+class FakeChatbot:
+    def __init__(self, llm_config=None):
+        self.llm_config = llm_config or {}
+        self.prompt_version = 1
+        self.embeddings = CachedEmbeddings(CountingEmbeddings(), "fake")
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# 챗봇 엔진 재사용/핫스왑 테스트
+@mock.patch("chatbot.chatbot.Chatbot_Run", FakeChatbot)
+class ChatbotEngineTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        ChatbotEngine._instance = None
+        self.engine = ChatbotEngine()
+
+    def tearDown(self):
+        ChatbotEngine._instance = None
+
+    def test_engine_is_built_once(self):
+        with mock.patch("chatbot.prompts.prompt_cache") as prompt_cache:
+            self.engine.warm_up()
+        prompt_cache.warm_up.assert_called_once()
+        first = self.engine.get()
+
+        self.assertIs(self.engine.get(), first)
+        self.assertIsNotNone(self.engine.status()["warmup_ms"])
+
+    def test_reload_swaps_engine(self):
+        first = self.engine.get()
+        status = self.engine.reload({"temperature": 0.1})
+
+        self.assertIsNot(self.engine.get(), first)
+        self.assertEqual(status["version"], 1)
+        self.assertEqual(status["llm_config"], {"temperature": 0.1})
+
+
+# 비슷한 질문 답변 캐시 테스트
+class SemanticAnswerCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cache = SemanticAnswerCache(
+            {"ENABLED": True, "THRESHOLD": 0.9, "TTL": 60, "MAX_ENTRIES": 2}
+        )
+        self.fingerprint = profile_fingerprint(
+            {"allergies": ["땅콩"], "diet": True, "preferred_cuisine": ["한식"]}
+        )
+
+    def test_similar_question_hits(self):
+        hits = SEMANTIC_CACHE.value(result="hit")
+        misses = SEMANTIC_CACHE.value(result="miss")
+        async_to_sync(self.cache.store)([1.0, 0.0], self.fingerprint, "닭가슴살 샐러드")
+
+        answer = async_to_sync(self.cache.lookup)([0.99, 0.05], self.fingerprint)
+        self.assertEqual(answer, "닭가슴살 샐러드")
+        self.assertIsNone(
+            async_to_sync(self.cache.lookup)([0.0, 1.0], self.fingerprint)
+        )
+
+        self.assertEqual(SEMANTIC_CACHE.value(result="hit") - hits, 1)
+        self.assertEqual(SEMANTIC_CACHE.value(result="miss") - misses, 1)
+
+    def test_other_profile_misses(self):
+        async_to_sync(self.cache.store)([1.0, 0.0], self.fingerprint, "닭가슴살 샐러드")
+        other = profile_fingerprint({"allergies": [], "diet": False})
+
+        self.assertIsNone(async_to_sync(self.cache.lookup)([1.0, 0.0], other))
+
+    def test_answers_are_shared_across_nicknames(self):
+        # 알러지/다이어트/선호 음식이 같으면 닉네임/나이가 달라도 같은 답변 사용
+        profile = {"allergies": ["땅콩"], "diet": True, "preferred_cuisine": ["한식"]}
+        self.assertEqual(
+            profile_fingerprint({**profile, "nickname": "가", "age": 20}),
+            profile_fingerprint({**profile, "nickname": "나", "age": 40}),
+        )
+        self.assertEqual(profile_fingerprint(profile), self.fingerprint)
+
+        # 캐시할 답변의 프롬프트에는 닉네임을 넣지 않음
+        chatbot = Chatbot_Run.__new__(Chatbot_Run)
+        user_data = {**profile, "nickname": "가"}
+        shared = chatbot._chain_input("양파 요리", user_data, shared=True)
+        personal = chatbot._chain_input("양파 요리", user_data)
+        self.assertNotIn("닉네임", shared["user_data"])
+        self.assertIn("알러지: 땅콩", shared["user_data"])
+        self.assertIn("닉네임: 가", personal["user_data"])
+
+    def test_invalidate_on_index_change(self):
+        async_to_sync(self.cache.store)([1.0, 0.0], self.fingerprint, "닭가슴살 샐러드")
+        self.cache.invalidate()
+
+        self.assertIsNone(
+            async_to_sync(self.cache.lookup)([1.0, 0.0], self.fingerprint)
+        )
+
+    def test_least_recently_used_is_evicted(self):
+        async_to_sync(self.cache.store)([1.0, 0.0, 0.0], self.fingerprint, "a")
+        async_to_sync(self.cache.store)([0.0, 1.0, 0.0], self.fingerprint, "b")
+        async_to_sync(self.cache.lookup)([1.0, 0.0, 0.0], self.fingerprint)
+        async_to_sync(self.cache.store)([0.0, 0.0, 1.0], self.fingerprint, "c")
+
+        self.assertEqual(
+            async_to_sync(self.cache.lookup)([1.0, 0.0, 0.0], self.fingerprint), "a"
+        )
+        self.assertIsNone(
+            async_to_sync(self.cache.lookup)([0.0, 1.0, 0.0], self.fingerprint)
+        )
+        self.assertEqual(
+            async_to_sync(self.cache.lookup)([0.0, 0.0, 1.0], self.fingerprint), "c"
+        )
+
+    def test_concurrent_stores_keep_every_answer(self):
+        async def store_both():
+            await asyncio.gather(
+                self.cache.store([1.0, 0.0], self.fingerprint, "a"),
+                self.cache.store([0.0, 1.0], self.fingerprint, "b"),
+            )
+
+        async_to_sync(store_both)()
+
+        self.assertEqual(
+            async_to_sync(self.cache.lookup)([1.0, 0.0], self.fingerprint), "a"
+        )
+        self.assertEqual(
+            async_to_sync(self.cache.lookup)([0.0, 1.0], self.fingerprint), "b"
+        )
+
+    def test_hit_only_touches_last_used_time(self):
+        async_to_sync(self.cache.store)([1.0, 0.0], self.fingerprint, "a")
+
+        with mock.patch.object(cache, "aset") as aset, mock.patch.object(
+            cache, "aset_many"
+        ) as aset_many:
+            answer = async_to_sync(self.cache.lookup)([1.0, 0.0], self.fingerprint)
+
+        # 답변은 다시 쓰지 않고 마지막 사용 시각만 갱신
+        self.assertEqual(answer, "a")
+        aset_many.assert_not_called()
+        aset.assert_called_once()
+        self.assertIn(":used:", aset.call_args.args[0])
+
+
+# 임베딩 캐시 테스트
+class CachedEmbeddingsTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(
+            self.backend, "fake", {"LOCAL_SIZE": 2, "TTL": 60}
+        )
+
+    def test_only_missing_texts_are_embedded(self):
+        self.embeddings.embed_documents(["양파", "감자"])
+        self.embeddings.embed_documents(["양파", "당근", "감자"])
+
+        self.assertEqual(self.backend.calls, [["양파", "감자"], ["당근"]])
+
+    def test_normalized_query_hits_cache(self):
+        first = self.embeddings.embed_query("닭가슴살  레시피")
+        second = async_to_sync(self.embeddings.aembed_query)(" 닭가슴살 레시피 ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.backend.calls), 1)
+        self.assertEqual(self.embeddings.stats()["misses"], 1)
+
+    def test_redis_tier_survives_local_eviction(self):
+        for text in ["a", "b", "c", "a"]:
+            self.embeddings.embed_query(text)
+
+        stats = self.embeddings.stats()
+        self.assertEqual(len(self.backend.calls), 3)
+        self.assertEqual(stats["redis_hits"], 1)
+
+    def test_document_embeddings_are_not_written_to_redis(self):
+        self.embeddings.embed_documents(["양파", "감자"])
+        async_to_sync(self.embeddings.aembed_documents)(["당근"])
+
+        keys = [self.embeddings._key(text) for text in ["양파", "감자", "당근"]]
+        self.assertEqual(cache.get_many(keys), {})
+        # 질문 임베딩은 Redis에 저장
+        self.embeddings.embed_query("양파 요리")
+        self.assertEqual(len(cache.get_many([self.embeddings._key("양파 요리")])), 1)
+
+
+# 별도 프로세스에서 저장소에 한 줄씩 추가
+def _put_embeddings(directory, worker):
+    store = EmbeddingStore(directory, "fake")
+    for i in range(50):
+        store.put_many([f"{worker}-{i}"], [[float(worker), float(i)]])
+
+
+# 문서 임베딩 디스크 저장소 테스트
+class EmbeddingStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_vectors_survive_reopen(self):
+        store = EmbeddingStore(self.directory.name, "fake")
+        store.put_many(["양파", "감자"], [[1.0, 2.0], [3.0, 4.0]])
+
+        reopened = EmbeddingStore(self.directory.name, "fake")
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.get_many(["감자", "당근"]), [[3.0, 4.0], None])
+
+    def test_two_writers_share_one_directory(self):
+        # 같은 디렉터리를 쓰는 두 프로세스 (각자 메모리 색인을 가짐)
+        first = EmbeddingStore(self.directory.name, "fake")
+        second = EmbeddingStore(self.directory.name, "fake")
+        first.put_many(["양파"], [[1.0, 2.0]])
+        second.put_many(["감자", "양파"], [[3.0, 4.0], [9.0, 9.0]])
+        first.put_many(["당근"], [[5.0, 6.0]])
+
+        expected = [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+        for store in (first, second, EmbeddingStore(self.directory.name, "fake")):
+            self.assertEqual(store.get_many(["양파", "감자", "당근"]), expected)
+
+    def test_concurrent_processes_keep_keys_and_vectors_aligned(self):
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_put_embeddings, args=(self.directory.name, w))
+            for w in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+            self.assertEqual(worker.exitcode, 0)
+
+        store = EmbeddingStore(self.directory.name, "fake")
+        texts = [f"{w}-{i}" for w in range(4) for i in range(50)]
+        self.assertEqual(len(store), 200)
+        self.assertEqual(
+            store.get_many(texts),
+            [[float(w), float(i)] for w in range(4) for i in range(50)],
+        )
+
+    def test_partial_row_is_ignored_and_overwritten(self):
+        store = EmbeddingStore(self.directory.name, "fake")
+        store.put_many(["양파"], [[1.0, 2.0]])
+        # 벡터만 기록하고 종료된 쓰기
+        with open(store.vectors_path, "ab") as f:
+            f.write(b"\0" * 6)
+
+        reader = EmbeddingStore(self.directory.name, "fake")
+        self.assertEqual(len(reader), 1)
+        reader.put_many(["감자"], [[3.0, 4.0]])
+        self.assertEqual(
+            EmbeddingStore(self.directory.name, "fake").get_many(["양파", "감자"]),
+            [[1.0, 2.0], [3.0, 4.0]],
+        )
+
+    def test_rebuild_does_not_call_api(self):
+        backend = CountingEmbeddings()
+        store = EmbeddingStore(self.directory.name, "fake")
+        CachedEmbeddings(backend, "fake", store=store).embed_documents(["a", "bb"])
+
+        # 프로세스/Redis 캐시가 비어 있어도 저장소에서 가져옴
+        cache.clear()
+        rebuilt = CachedEmbeddings(backend, "fake", store=store)
+        vectors = rebuilt.embed_documents(["bb", "a"])
+
+        self.assertEqual(vectors, [[2.0, 1.0], [1.0, 1.0]])
+        self.assertEqual(backend.calls, [["a", "bb"]])
+        self.assertEqual(rebuilt.stats()["store_hits"], 2)
+
+
+# BM25 색인 / RRF 테스트
+class BM25IndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add(
+            ["1-0", "1-1", "1-2"],
+            [
+                "닭가슴살 샐러드: 닭가슴살, 양상추",
+                "김치찌개: 김치, 돼지고기",
+                "땅콩 쿠키",
+            ],
+            [{"chunk_id": "1-0"}, {"chunk_id": "1-1"}, {"chunk_id": "1-2"}],
+        )
+
+    def test_search_matches_korean_substrings(self):
+        results = self.index.search("닭가슴살로 만든 요리")
+        self.assertEqual(results[0].metadata["chunk_id"], "1-0")
+
+    def test_exact_search_only_for_short_exact_queries(self):
+        self.assertEqual(len(self.index.exact_search("김치찌개")), 1)
+        self.assertEqual(self.index.exact_search("김치볶음밥"), [])
+        self.assertEqual(self.index.exact_search("김치찌개 맛있게 끓이는 법"), [])
+
+    def test_readding_chunk_replaces_it(self):
+        self.index.add(["1-2"], ["두부 조림"], [{"chunk_id": "1-2"}])
+
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.search("땅콩"), [])
+
+    def test_rrf_prefers_documents_found_by_both(self):
+        a, b, c = (Document(page_content=text) for text in "abc")
+
+        fused = reciprocal_rank_fusion([[a, b], [c, b]], limit=2)
+        self.assertEqual(fused[0].page_content, "b")
+
+
+# 레시피 재료/알러지 메타데이터 테스트
+class RecipeMetadataTest(SimpleTestCase):
+
+    def test_ingredients_and_allergens_are_extracted(self):
+        metadata = recipe_metadata(
+            "요리명: 땅콩 닭가슴살 샐러드\n재료: 닭가슴살 200g, 땅콩버터(2큰술), 양상추 1/2통\n칼로리: 350kcal",
+            ["땅콩", "우유"],
+        )
+
+        self.assertEqual(metadata["ingredients"], "닭가슴살|땅콩버터|양상추")
+        self.assertTrue(metadata["is_diet"])
+        self.assertTrue(metadata["allergen_땅콩"])
+        self.assertFalse(metadata["allergen_우유"])
+
+    def test_allergy_filter(self):
+        self.assertIsNone(allergy_filter([]))
+        self.assertEqual(
+            allergy_filter(["땅콩", "우유"]),
+            {
+                "$and": [
+                    {"allergen_땅콩": {"$ne": True}},
+                    {"allergen_우유": {"$ne": True}},
+                ]
+            },
+        )
+        # 플래그가 없는 청크(새 알러지 항목)는 재료 목록으로 확인
+        self.assertFalse(passes_allergy_filter({"ingredients": "새우|양파"}, ["새우"]))
+        self.assertTrue(passes_allergy_filter({"allergen_새우": False}, ["새우"]))
+
+    def test_allergen_added_later_without_ingredient_column(self):
+        # 재료 컬럼이 없는 CSV: 적재 때 없던 알러지 항목도 레시피 텍스트로 제외
+        metadata = recipe_metadata("요리명: 새우 볶음밥\n설명: 칵테일 새우와 밥", [])
+        self.assertEqual(metadata["ingredients"], "")
+        self.assertFalse(passes_allergy_filter(metadata, ["새우"]))
+        self.assertTrue(passes_allergy_filter(metadata, ["땅콩"]))
+
+        # 저장된 텍스트가 없는 예전 청크는 청크 본문으로 확인
+        self.assertFalse(passes_allergy_filter({}, ["새우"], "요리명: 새우 볶음밥"))
+
+    def test_allergy_names_are_normalized(self):
+        metadata = recipe_metadata(
+            "Name: Pasta\nIngredient: Peanut Butter, Milk", [" Peanut butter"]
+        )
+
+        self.assertTrue(metadata["allergen_peanutbutter"])
+        self.assertFalse(passes_allergy_filter(metadata, ["PEANUT BUTTER"]))
+        self.assertFalse(passes_allergy_filter(metadata, ["milk "]))
+        self.assertEqual(
+            allergy_filter(["Peanut Butter"]), {"allergen_peanutbutter": {"$ne": True}}
+        )
+
+
+# 레시피 검색(알러지 필터/다이어트 정렬) 테스트
+class VectorStoreSearchTest(SimpleTestCase):
+
+    def test_allergen_added_after_ingest_is_filtered(self):
+        docs = [
+            Document(page_content="새우볶음밥", metadata={"ingredients": "새우|밥"}),
+            Document(page_content="땅콩조림", metadata={"allergen_땅콩": False}),
+            Document(page_content="김밥", metadata={"ingredients": "김|밥"}),
+            Document(page_content="계란말이", metadata={"ingredients": "계란"}),
+            Document(page_content="두부조림", metadata={"ingredients": "두부"}),
+        ]
+        manager = object.__new__(VectorStoreManager)
+        manager.search_kwargs = {"k": 3, "fetch_k": 10}
+        manager.db = mock.Mock()
+        manager.db.amax_marginal_relevance_search_by_vector = mock.AsyncMock(
+            return_value=docs
+        )
+
+        results = async_to_sync(manager.asearch_by_vector)([1.0], ["새우"])
+
+        self.assertEqual(
+            [doc.page_content for doc in results], ["땅콩조림", "김밥", "계란말이"]
+        )
+        kwargs = manager.db.amax_marginal_relevance_search_by_vector.call_args.kwargs
+        self.assertEqual(kwargs["k"], 10)
+        self.assertEqual(kwargs["filter"], {"allergen_새우": {"$ne": True}})
+
+    def test_exact_match_results_follow_diet_order(self):
+        docs = [
+            Document(page_content="닭갈비", metadata={"is_diet": False}),
+            Document(page_content="닭가슴살 샐러드", metadata={"is_diet": True}),
+        ]
+        manager = object.__new__(VectorStoreManager)
+        manager.exact_search = mock.Mock(return_value=list(docs))
+
+        results = async_to_sync(manager.asearch)("닭", diet=True)
+
+        self.assertEqual(
+            [doc.page_content for doc in results], ["닭가슴살 샐러드", "닭갈비"]
+        )
+
+    def test_reload_reads_index_written_by_another_client(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        embeddings = FakeEmbeddings(dim=8)
+        manager = object.__new__(VectorStoreManager)
+        manager.persist_directory = directory.name
+        manager.embeddings = embeddings
+        manager.search_kwargs = {"k": 3, "fetch_k": 10}
+        manager._lock = threading.Lock()
+        manager._open_index()
+        old_client = manager.client
+
+        # 다른 프로세스(Celery 워커)가 같은 경로에 임베딩한 상황
+        manager.client.clear_system_cache()
+        Chroma(
+            client=chromadb.PersistentClient(path=directory.name),
+            embedding_function=embeddings,
+        ).add_documents([Document(page_content="닭가슴살 샐러드")])
+
+        with mock.patch("builtins.print"):
+            manager.reload_index()
+
+        self.assertIsNot(manager.client, old_client)
+        self.assertEqual(manager.db.get()["documents"], ["닭가슴살 샐러드"])
+
+
+# 오프라인 가짜 제공자 테스트
+class FakeProviderTest(SimpleTestCase):
+
+    def test_fake_embeddings_are_deterministic_and_similar(self):
+        embeddings = FakeEmbeddings(dim=64)
+        first, same, similar, other = embeddings.embed_documents(
+            ["닭가슴살 샐러드", "닭가슴살 샐러드", "닭가슴살 샐러드 레시피", "김치찌개"]
+        )
+
+        self.assertEqual(first, same)
+        # 정규화된 벡터라 내적 = 코사인 유사도
+        similar_score = sum(x * y for x, y in zip(first, similar))
+        other_score = sum(x * y for x, y in zip(first, other))
+        self.assertGreater(similar_score, other_score)
+
+    def test_fake_llm_streams_fixed_number_of_tokens(self):
+        llm = FakeChatModel(response_tokens=5)
+        tokens = [chunk.content for chunk in llm.stream("양파 요리 추천")]
+
+        self.assertEqual(len(tokens), 5)
+        self.assertEqual("".join(tokens), llm.invoke("양파 요리 추천").content)
+
+    def test_registry_uses_settings(self):
+        with override_settings(
+            CHATBOT_PROVIDERS={
+                "EMBEDDING": "fake",
+                "LLM": "fake",
+                "FAKE": {
+                    "EMBEDDING_DIM": 8,
+                    "EMBEDDING_LATENCY": 0.0,
+                    "LLM_LATENCY": 0.0,
+                    "TOKENS_PER_SECOND": 0.0,
+                    "RESPONSE_TOKENS": 3,
+                },
+            }
+        ):
+            embeddings, model_name = get_embeddings()
+            llm = get_llm({"model_name": "gpt-4o-mini", "temperature": 0.9})
+
+            self.assertEqual(model_name, "fake-8")
+            self.assertEqual(len(embeddings.embed_query("양파")), 8)
+            self.assertEqual(llm.model_name, "gpt-4o-mini")
+            with self.assertRaises(ImproperlyConfigured):
+                get_embeddings("unknown")
+
+
+# 단계별 소요 시간 기록 테스트
+class TimingTest(SimpleTestCase):
+
+    def test_timings_are_ignored_outside_collect(self):
+        with timed("retrieval"):
+            pass
+        with collect_timings() as timings:
+            pass
+
+        self.assertEqual(timings, {})
+
+    def test_concurrent_tasks_do_not_share_timings(self):
+        async def turn(seconds):
+            with collect_timings() as timings:
+                record_timing("generation", seconds)
+                await asyncio.sleep(0)
+                record_timing("generation", seconds)
+            return timings
+
+        async def main():
+            return await asyncio.gather(turn(1.0), turn(2.0))
+
+        first, second = async_to_sync(main)()
+        self.assertEqual(first, {"generation": 2.0})
+        self.assertEqual(second, {"generation": 4.0})
+
+
+# Prometheus 메트릭 테스트
+class MetricsTest(SimpleTestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, stage="llm")
+
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="llm",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{stage="llm",le="1.0"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="llm",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{stage="llm"} 3', lines)
+
+    def test_llm_handler_records_first_token_and_inflight(self):
+        handler = LLMMetricsHandler()
+        llm = FakeChatModel(response_tokens=3).with_config(callbacks=[handler])
+
+        with track_turn("test") as timings:
+            list(llm.stream("양파 요리"))
+
+        self.assertIn("first_token", timings)
+        self.assertIn("generation", timings)
+        self.assertEqual(LLM_INFLIGHT.value(), 0)
+
+    def test_metrics_are_summed_across_workers(self):
+        cache.clear()
+        turns = Counter("test_turns_total", "test")
+        seconds = Histogram("test_seconds", "test", buckets=(1.0,))
+        with mock.patch("chatbot.metrics.REGISTRY", [turns, seconds]):
+            with mock.patch("chatbot.metrics._process_id", return_value="web-1:10"):
+                turns.inc(2, mode="stream")
+                seconds.observe(0.5)
+                publish_metrics()
+
+            # 다른 워커 프로세스가 수집 요청을 받음
+            turns._values.clear()
+            seconds._values.clear()
+            turns.inc(3, mode="stream")
+            seconds.observe(5.0)
+            with mock.patch("chatbot.metrics._process_id", return_value="web-1:11"):
+                lines = render_metrics().splitlines()
+
+        self.assertIn('test_turns_total{mode="stream"} 5', lines)
+        self.assertIn('test_seconds_bucket{le="1.0"} 1', lines)
+        self.assertIn("test_seconds_count 2", lines)
+
+
+# 프롬프트용 레시피 정보 조립 테스트
+class ContextBuilderTest(SimpleTestCase):
+
+    def chunks(self, row, text, start=0):
+        return [
+            Document(
+                page_content=chunk,
+                metadata={"source": "r.csv", "row": row, "chunk_id": f"1-{start + i}"},
+            )
+            for i, chunk in enumerate(text)
+        ]
+
+    def test_overlapping_chunks_are_merged_once(self):
+        row = "요리명: 김치찌개\n재료: 김치, 돼지고기\n조리법: 김치를 볶고 물을 부어 끓인다."
+        docs = self.chunks(0, [row[:30], row[20:50], row[40:]])
+
+        self.assertEqual(merge_chunks(list(reversed(docs))), row)
+        context = build_context([docs[2], docs[0], docs[1]])
+        self.assertEqual(context.count("김치찌개"), 1)
+        self.assertEqual(context.count("물을 부어"), 1)
+
+    def test_compact_rendering_and_budget(self):
+        docs = [
+            *self.chunks(0, ["요리명: 된장찌개\n비고: \n칼로리:   200kcal"]),
+            *self.chunks(1, ["요리명: 불고기\n조리법: " + "양념에 재운다. " * 200], 10),
+            *self.chunks(2, ["요리명: 비빔밥"], 20),
+        ]
+
+        context = build_context(docs, max_tokens=100)
+        self.assertTrue(context.startswith("요리명: 된장찌개\n칼로리: 200kcal"))
+        self.assertNotIn("비고", context)
+        # 예산을 넘는 레시피부터는 넣지 않음
+        self.assertNotIn("불고기", context)
+        self.assertNotIn("비빔밥", context)
+
+        # 첫 레시피가 예산보다 길면 잘라서 넣음
+        context = build_context(docs[1:], max_tokens=50)
+        self.assertLessEqual(count_tokens(context), 50)
+        self.assertTrue(context.endswith("…"))
+
+
+# 토큰 계산 인코딩 로딩 테스트
+class TokenEncodingTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(tokens, _encodings={}, _failed_at={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failed_download_is_retried_after_interval(self):
+        encoding = mock.Mock()
+        encoding.encode.return_value = [1, 2]
+        with mock.patch(
+            "tiktoken.get_encoding", side_effect=[OSError("offline"), encoding]
+        ) as get_encoding:
+            estimate = count_tokens("양파 요리")
+            self.assertEqual(count_tokens("양파 요리"), estimate)
+            # 재시도 간격 안에서는 다시 받지 않음
+            self.assertEqual(get_encoding.call_count, 1)
+
+            with mock.patch.object(tokens, "RETRY_INTERVAL", 0):
+                self.assertEqual(count_tokens("양파 요리"), 2)
+            self.assertEqual(count_tokens("양파 요리"), 2)
+            self.assertEqual(get_encoding.call_count, 2)
+
+
+# 레시피 임베딩 작업 상태 테스트
+class RecipeEmbeddingTaskTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.recipe = Recipe.objects.create(csv_file="csv_file/recipes.csv")
+
+    def status(self):
+        self.recipe.refresh_from_db()
+        return self.recipe.embedding_status
+
+    def test_queue_records_task_id(self):
+        with mock.patch.object(embed_recipe, "apply_async") as apply_async:
+            apply_async.return_value.id = "task-1"
+            with self.captureOnCommitCallbacks(execute=True):
+                queue_embedding(self.recipe)
+
+        apply_async.assert_called_once_with((self.recipe.id,), retry=False)
+        self.assertEqual(self.status(), Recipe.STATUS_QUEUED)
+        self.assertEqual(self.recipe.embedding_task_id, "task-1")
+
+    def test_broker_down_marks_failed(self):
+        with mock.patch.object(
+            embed_recipe, "apply_async", side_effect=OperationalError("연결 거부")
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                queue_embedding(self.recipe)
+
+        self.assertEqual(self.status(), Recipe.STATUS_FAILED)
+        self.assertIn("연결 거부", self.recipe.embedding_error)
+
+    def test_task_runs_to_done(self):
+        statuses = []
+
+        def add_recipe(recipe, on_progress=None):
+            statuses.append(self.status())
+            return {"chunks": 3}
+
+        with mock.patch("chatbot.chatbot.VectorStoreManager") as manager:
+            manager.return_value.add_recipe.side_effect = add_recipe
+            self.assertEqual(embed_recipe(self.recipe.id), {"chunks": 3})
+
+        self.assertEqual(statuses, [Recipe.STATUS_RUNNING])
+        self.assertEqual(self.status(), Recipe.STATUS_DONE)
+
+    def test_task_failure_is_recorded(self):
+        with mock.patch("chatbot.chatbot.VectorStoreManager") as manager:
+            manager.return_value.add_recipe.side_effect = RuntimeError("임베딩 실패")
+            with self.assertRaises(RuntimeError):
+                embed_recipe(self.recipe.id)
+
+        self.assertEqual(self.status(), Recipe.STATUS_FAILED)
+        self.assertEqual(self.recipe.embedding_error, "임베딩 실패")
+
+
+class FakeCSVFile:
+    def __init__(self, text, name="csv_file/recipes.csv"):
+        self.name = name
+        self.raw = BytesIO(text.encode("utf-8-sig"))
+
+    def open(self, mode="rb"):
+        return self.raw
+
+
+# 레시피 CSV 읽기 테스트
+class CSVDocumentTest(SimpleTestCase):
+
+    def test_rows_become_documents(self):
+        csv_file = FakeCSVFile(
+            '요리명,재료\n 김치찌개 , 김치\n\n\n된장찌개,"된장, 두부"\n'
+        )
+
+        docs = list(iter_csv_documents(csv_file))
+
+        # 빈 줄은 건너뛰고, 행 번호는 데이터 행 기준으로 이어짐
+        self.assertEqual(
+            [(doc.page_content, doc.metadata) for doc in docs],
+            [
+                ("요리명: 김치찌개\n재료: 김치", {"source": csv_file.name, "row": 0}),
+                (
+                    "요리명: 된장찌개\n재료: 된장, 두부",
+                    {"source": csv_file.name, "row": 1},
+                ),
+            ],
+        )
+        self.assertTrue(csv_file.raw.closed)
+
+    def test_file_is_read_lazily(self):
+        rows = "".join(f"요리 {i},재료 {i}\n" for i in range(20000))
+        csv_file = FakeCSVFile("요리명,재료\n" + rows)
+        size = len(csv_file.raw.getvalue())
+
+        docs = iter_csv_documents(csv_file)
+        first = next(docs)
+
+        self.assertEqual(first.metadata["row"], 0)
+        # 첫 문서를 만들 때는 파일 앞부분(버퍼 크기)만 읽음
+        self.assertLess(csv_file.raw.tell(), size // 10)
+        self.assertEqual(sum(1 for _ in docs), 19999)
+
+
+class FakeVectorStore:
+    def __init__(self, before_add=None):
+        self.added = []
+        self.before_add = before_add
+
+    def add_texts(self, texts, metadatas, ids):
+        if self.before_add:
+            self.before_add(ids)
+        self.added.extend(ids)
+
+
+class FakeBM25:
+    def __init__(self):
+        self.added = []
+
+    def add(self, ids, texts, metadatas):
+        self.added.extend(ids)
+
+
+# 레시피 임베딩 진행률 기록/이어서 진행 테스트
+class RecipeIngestorTest(TestCase):
+
+    def setUp(self):
+        self.recipe = Recipe.objects.create(csv_file="csv_file/recipes.csv")
+        # 2개씩 5개 배치
+        self.chunks = [(f"1-{i}", f"청크 {i}", {"row": i // 2}) for i in range(10)]
+
+    def ingest(self, store, on_progress=None):
+        manager = mock.Mock(db=store, bm25=FakeBM25())
+        ingestor = RecipeIngestor(manager, batch_size=2, concurrency=3)
+        try:
+            ingestor.ingest(self.recipe, iter(self.chunks), on_progress)
+        finally:
+            self.recipe.refresh_from_db()
+        return manager
+
+    def test_progress_only_covers_contiguous_batches(self):
+        later_done = threading.Event()
+        progress_saved = threading.Event()
+        finished = []
+        progress = []
+
+        # 배치 0은 배치 1, 2, 4가 끝난 뒤 완료, 배치 3은 진행률 기록 뒤 실패
+        def before_add(ids):
+            batch = int(ids[0].split("-")[1]) // 2
+            if batch == 0:
+                self.assertTrue(later_done.wait(5))
+            elif batch == 3:
+                self.assertTrue(progress_saved.wait(5))
+                raise RuntimeError("임베딩 API 오류")
+            else:
+                finished.append(batch)
+                if len(finished) == 3:
+                    later_done.set()
+
+        def on_progress(embedded, total):
+            progress.append(embedded)
+            progress_saved.set()
+
+        with self.assertRaises(RuntimeError):
+            self.ingest(FakeVectorStore(before_add), on_progress)
+
+        # 배치 4는 끝났지만 배치 3이 실패했으므로 배치 0~2까지만 기록
+        self.assertEqual(progress, [6])
+        self.assertEqual(self.recipe.embedded_chunks, 6)
+        self.assertIsNone(self.recipe.total_chunks)
+
+    def test_resume_skips_embedded_chunks(self):
+        Recipe.objects.filter(pk=self.recipe.pk).update(embedded_chunks=6)
+        self.recipe.refresh_from_db()
+        store = FakeVectorStore()
+
+        manager = self.ingest(store)
+
+        # 이미 저장된 청크는 다시 임베딩하지 않지만 BM25 색인에는 다시 추가
+        self.assertEqual(store.added, ["1-6", "1-7", "1-8", "1-9"])
+        self.assertEqual(sorted(manager.bm25.added), sorted(c[0] for c in self.chunks))
+        self.assertEqual(self.recipe.embedded_chunks, 10)
+        self.assertEqual(self.recipe.total_chunks, 10)
+
+
+class CountingVectorStore:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings(dim=8)
+        self.searches = 0
+
+    def get_retriever(self):
+        return None
+
+    def exact_search(self, query, allergies=()):
+        return []
+
+    async def asearch(self, query, allergies=(), diet=False):
+        self.searches += 1
+        return [Document(page_content=f"요리명: {query}", metadata={"row": 0})]
+
+
+# 질문당 레시피 검색 횟수 테스트
+@override_settings(
+    CHATBOT_PROVIDERS={
+        "EMBEDDING": "fake",
+        "LLM": "fake",
+        "FAKE": {
+            "EMBEDDING_DIM": 8,
+            "EMBEDDING_LATENCY": 0.0,
+            "LLM_LATENCY": 0.0,
+            "TOKENS_PER_SECOND": 0.0,
+            "RESPONSE_TOKENS": 5,
+        },
+    },
+)
+class RetrieveOncePerTurnTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        with mock.patch("chatbot.chatbot.VectorStoreManager", CountingVectorStore):
+            self.chatbot = Chatbot_Run()
+
+    def test_astream_searches_once(self):
+        chunks = async_to_sync(self._collect)("양파 요리 추천해줘")
+
+        self.assertTrue(chunks)
+        self.assertEqual(self.chatbot.db.searches, 1)
+
+    def test_ask_searches_once_per_turn(self):
+        for turn, question in enumerate(["감자 요리", "당근 요리"], start=1):
+            async_to_sync(self.chatbot.ask)(question, {}, "이전 대화")
+            self.assertEqual(self.chatbot.db.searches, turn)
+
+    def test_chain_invoke_searches_once(self):
+        prompt, _ = prompt_cache.get()
+        async_to_sync(self.chatbot.rag_chain.ainvoke)(
+            self.chatbot._chain_input("두부 요리", {}),
+            config={"configurable": {"prompt": prompt}},
+        )
+        self.assertEqual(self.chatbot.db.searches, 1)
+
+    async def _collect(self, question):
+        return [chunk async for chunk in self.chatbot.astream(question, {})]
+
+
+# 채팅 기록 키셋 페이지네이션 테스트
+class ChatHistoryPageTest(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="history@example.com", nickname="history"
+        )
+        self.room = ChatRoom.objects.create(name="history", created_by=user)
+        ChatMessage.objects.bulk_create(
+            ChatMessage(room=self.room, user=user, message=f"메시지 {index}")
+            for index in range(7)
+        )
+        # 같은 시각에 저장된 메시지도 id로 순서가 정해지는지 확인
+        ChatMessage.objects.update(created_at=timezone.now())
+
+    def test_pages_walk_back_without_gaps(self):
+        first = fetch_history_page(self.room.id, limit=3)
+        second = fetch_history_page(self.room.id, first["cursor"], limit=3)
+        last = fetch_history_page(self.room.id, second["cursor"], limit=3)
+
+        messages = last["messages"] + second["messages"] + first["messages"]
+        self.assertEqual(
+            [m["message"] for m in messages], [f"메시지 {i}" for i in range(7)]
+        )
+        self.assertTrue(first["has_more"])
+        self.assertFalse(last["has_more"])
+        self.assertIsNone(last["cursor"])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+# 최근 대화 창 + 방 요약 테스트
+@override_settings(
+    CHATBOT_MEMORY={
+        "RECENT_TURNS": 2,
+        "RECENT_TOKENS": 1000,
+        "SUMMARY_TOKENS": 100,
+        "SUMMARY_BATCH_TOKENS": 4000,
+        "SUMMARY_DEBOUNCE": 60,
+        "SUMMARY_ENABLED": True,
+    },
+    CHATBOT_PROVIDERS={
+        "EMBEDDING": "fake",
+        "LLM": "fake",
+        "FAKE": {
+            "EMBEDDING_DIM": 8,
+            "EMBEDDING_LATENCY": 0.0,
+            "LLM_LATENCY": 0.0,
+            "TOKENS_PER_SECOND": 0.0,
+            "RESPONSE_TOKENS": 5,
+        },
+    },
+)
+class ConversationMemoryTest(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            email="memory@example.com", nickname="memory"
+        )
+        self.room = ChatRoom.objects.create(name="memory", created_by=user)
+        self.messages = ChatMessage.objects.bulk_create(
+            ChatMessage(
+                room=self.room,
+                user=user,
+                message=f"메시지 {index}",
+                message_type=(
+                    ChatMessage.USER_QUESTION
+                    if index % 2 == 0
+                    else ChatMessage.CHATBOT_RESPONSE
+                ),
+            )
+            for index in range(10)
+        )
+
+    def test_recent_window_is_bounded(self):
+        window = recent_messages(self.room.id)
+        self.assertEqual(
+            [m.message for m in window], [f"메시지 {i}" for i in (6, 7, 8, 9)]
+        )
+
+        with self.settings(
+            CHATBOT_MEMORY={**settings.CHATBOT_MEMORY, "RECENT_TOKENS": 10}
+        ):
+            self.assertLess(len(recent_messages(self.room.id)), 4)
+
+    def test_over_budget_answer_keeps_latest_turn(self):
+        # 예산보다 긴 답변 하나로 최근 대화가 비지 않고 잘라서라도 남음
+        long_answer = ChatMessage.objects.create(
+            room=self.room,
+            user=self.room.created_by,
+            message="아주 긴 답변입니다. " * 300,
+            message_type=ChatMessage.CHATBOT_RESPONSE,
+        )
+        budget = 100
+        with self.settings(
+            CHATBOT_MEMORY={**settings.CHATBOT_MEMORY, "RECENT_TOKENS": budget}
+        ):
+            window = recent_messages(self.room.id)
+            conversation = build_conversation(self.room.id)
+            update_summary(self.room.id)
+
+        self.assertEqual(window[-1].id, long_answer.id)
+        self.assertTrue(window[-1].message.endswith("…"))
+        self.assertEqual(window[-2].id, self.messages[9].id)
+        self.assertLessEqual(count_tokens(conversation), budget + 5)
+        self.assertIn("챗봇: 메시지 9", conversation)
+        long_answer.refresh_from_db()
+        self.assertEqual(long_answer.message, "아주 긴 답변입니다. " * 300)
+
+        # 창 밖의 메시지는 모두 요약에 합쳐짐
+        self.room.refresh_from_db()
+        self.assertTrue(self.room.summary)
+        self.assertEqual(self.room.summary_message_id, window[0].id - 1)
+
+    def test_summary_folds_older_messages_once(self):
+        update_summary(self.room.id)
+        self.room.refresh_from_db()
+
+        self.assertTrue(self.room.summary)
+        self.assertEqual(self.room.summary_message_id, self.messages[5].id)
+        conversation = build_conversation(self.room.id)
+        self.assertTrue(conversation.startswith(f"이전 대화 요약: {self.room.summary}"))
+        self.assertIn("챗봇: 메시지 9", conversation)
+        self.assertNotIn("메시지 5", conversation)
+
+        # 새 메시지가 없으면 LLM을 다시 호출하지 않음
+        with mock.patch("chatbot.memory.get_llm") as get_llm_mock:
+            update_summary(self.room.id)
+        get_llm_mock.assert_not_called()
+
+    def test_long_backlog_is_folded_in_bounded_batches(self):
+        llm = mock.Mock()
+        llm.invoke.side_effect = [
+            AIMessage(content="요약 1"),
+            AIMessage(content="요약 2"),
+            RuntimeError("LLM 오류"),
+        ]
+        with mock.patch("chatbot.memory.get_llm", return_value=llm), self.settings(
+            CHATBOT_MEMORY={**settings.CHATBOT_MEMORY, "SUMMARY_BATCH_TOKENS": 10}
+        ):
+            with self.assertRaises(RuntimeError):
+                update_summary(self.room.id)
+
+        # 한 번에 넣는 대화는 예산 안으로 제한되고, 앞 요약을 이어받음
+        prompts = [call.args[0] for call in llm.invoke.call_args_list]
+        self.assertEqual(len(prompts), 3)
+        self.assertIn("메시지 0", prompts[0])
+        self.assertNotIn("메시지 5", prompts[0])
+        self.assertIn("기존 요약:\n요약 1", prompts[1])
+
+        # 실패해도 이미 합친 묶음까지는 진행 위치가 저장됨
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.summary, "요약 2")
+        self.assertLess(self.room.summary_message_id, self.messages[5].id)
+        self.assertGreater(self.room.summary_message_id, self.messages[0].id)
+
+
+# LLM 동시 호출 제한 테스트
+class AdmissionControllerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.admission = AdmissionController()
+
+    async def _queue(self, user_key, positions):
+        async def on_position(position):
+            positions.append(position)
+
+        task = asyncio.create_task(self.admission.acquire(user_key, on_position))
+        await asyncio.sleep(0)
+        return task
+
+    @override_settings(
+        CHATBOT_ADMISSION={"MAX_CONCURRENT": 1, "PER_USER": 1, "MAX_QUEUE": 2}
+    )
+    async def test_fifo_queue_and_rejection(self):
+        await self.admission.acquire("a")
+        b_positions, c_positions = [], []
+        b = await self._queue("b", b_positions)
+        c = await self._queue("c", c_positions)
+        self.assertEqual((b_positions, c_positions), ([1], [2]))
+
+        with self.assertRaises(QueueFull):
+            await self.admission.acquire("d")
+
+        self.admission.release("a")
+        await b
+        await asyncio.sleep(0)
+        self.assertFalse(c.done())
+        self.assertEqual(c_positions, [2, 1])
+
+        self.admission.release("b")
+        await c
+        self.admission.release("c")
+        self.assertEqual(self.admission.status(), {"active": 0, "queued": 0})
+
+    @override_settings(
+        CHATBOT_ADMISSION={"MAX_CONCURRENT": 2, "PER_USER": 1, "MAX_QUEUE": 5}
+    )
+    async def test_per_user_limit_does_not_block_others(self):
+        await self.admission.acquire("a")
+        second = await self._queue("a", [])
+
+        # a의 두 번째 요청은 기다리고, 뒤에 온 b가 남은 자리를 받음
+        await asyncio.wait_for(self.admission.acquire("b"), timeout=1)
+        self.assertFalse(second.done())
+
+        # 대기 중 취소되면 대기열에서 빠짐
+        second.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await second
+        self.assertEqual(self.admission.status(), {"active": 2, "queued": 0})
+
+
+# 동시에 들어온 같은 질문의 생성 작업 공유 테스트
+class SingleFlightTest(SimpleTestCase):
+
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.calls = 0
+
+    async def _tokens(self, *tokens):
+        self.calls += 1
+        for token in tokens:
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def _collect(self, key, *tokens):
+        return [
+            chunk
+            async for chunk in self.single_flight.stream(
+                key, lambda: self._tokens(*tokens)
+            )
+        ]
+
+    def test_question_normalization(self):
+        self.assertEqual(
+            flight_key("  양파 요리 추천해줘? ", "p"),
+            flight_key("양파  요리 추천해줘", "p"),
+        )
+        self.assertNotEqual(flight_key("양파", "p"), flight_key("양파", "q"))
+        self.assertNotEqual(
+            flight_key("양파", "p"), flight_key("양파", "p", "이전 대화")
+        )
+
+    async def test_concurrent_requests_share_one_stream(self):
+        first = asyncio.create_task(self._collect("k", "양파", " 볶음"))
+        await asyncio.sleep(0.015)
+        # 생성 도중에 합류해도 처음 토큰부터 모두 받음
+        second = await self._collect("k", "다른", "답변")
+
+        self.assertEqual(await first, ["양파", " 볶음"])
+        self.assertEqual(second, ["양파", " 볶음"])
+        self.assertEqual(self.calls, 1)
+
+        # 끝난 작업은 남겨 두지 않음
+        await asyncio.sleep(0)
+        self.assertEqual(self.single_flight.in_flight(), 0)
+        self.assertEqual(await self._collect("k", "새", "답변"), ["새", "답변"])
+        self.assertEqual(self.calls, 2)
+
+    async def test_users_with_different_prompt_profiles_are_not_coalesced(self):
+        generated = []
+
+        async def generate(query, user_data, conversation, prompt, version, admit):
+            generated.append(user_data["nickname"])
+            await asyncio.sleep(0.01)
+            yield f"{user_data['nickname']}님, 양파볶음 어떠세요?"
+
+        chatbot = Chatbot_Run.__new__(Chatbot_Run)
+        chatbot._generate = generate
+        # 알러지/다이어트/선호 음식은 같고 닉네임만 다른 두 사용자
+        profile = {"allergies": ["땅콩"], "diet": False, "preferred_cuisine": []}
+        first, second = await asyncio.gather(
+            chatbot.ask("양파 요리", {**profile, "nickname": "가"}),
+            chatbot.ask("양파 요리", {**profile, "nickname": "나"}),
+        )
+
+        self.assertEqual(sorted(generated), ["가", "나"])
+        self.assertTrue(first.content.startswith("가님"))
+        self.assertTrue(second.content.startswith("나님"))
+
+    async def test_error_reaches_every_waiter(self):
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("LLM 오류")
+            yield
+
+        async def collect():
+            return [c async for c in self.single_flight.stream("e", failing)]
+
+        results = await asyncio.gather(collect(), collect(), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    async def test_generation_stops_when_every_subscriber_leaves(self):
+        stopped = asyncio.Event()
+
+        async def endless():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "토큰"
+            finally:
+                stopped.set()
+
+        async def first_chunk():
+            async for chunk in self.single_flight.stream("c", endless):
+                return chunk
+
+        first, second = await asyncio.gather(first_chunk(), first_chunk())
+
+        self.assertEqual((first, second), ("토큰", "토큰"))
+        await asyncio.wait_for(stopped.wait(), timeout=1)
+        await asyncio.sleep(0)
+        self.assertEqual(self.single_flight.in_flight(), 0)
+
+    @override_settings(
+        CHATBOT_ADMISSION={"MAX_CONCURRENT": 1, "PER_USER": 1, "MAX_QUEUE": 0}
+    )
+    async def test_duplicate_request_joins_without_taking_a_slot(self):
+        admission = AdmissionController()
+        llm_calls = []
+
+        async def rag_stream(inputs, config):
+            llm_calls.append(admission.status())
+            for token in ("양파", "볶음"):
+                await asyncio.sleep(0.01)
+                yield AIMessage(content=token)
+
+        chatbot = Chatbot_Run.__new__(Chatbot_Run)
+        chatbot._lookup_cache = mock.AsyncMock(return_value=(None, None, None))
+        chatbot.rag_chain = mock.Mock(astream=rag_stream)
+
+        # 같은 사용자가 같은 질문을 두 번 보냄 (사용자당 자리 1개, 대기열 없음)
+        def admit():
+            return admission.slot("a")
+
+        first, second = await asyncio.gather(
+            chatbot.ask("양파 요리", {}, admit=admit),
+            chatbot.ask("양파 요리", {}, admit=admit),
+        )
+
+        self.assertEqual((first.content, second.content), ("양파볶음", "양파볶음"))
+        self.assertEqual(llm_calls, [{"active": 1, "queued": 0}])
+        self.assertEqual(admission.status(), {"active": 0, "queued": 0})
+
+
+# Langfuse 프롬프트 캐시 테스트
+class PromptCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(
+            CHATBOT_PROMPT_CACHE={
+                "TTL": 300,
+                "DIRECTORY": directory.name,
+                "WARM_UP_TIMEOUT": 1,
+            }
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.langfuse = mock.Mock()
+        self.langfuse.get_prompt.return_value = mock.Mock(
+            version=3,
+            get_langchain_prompt=mock.Mock(return_value="{recipes}\n질문: {question}"),
+        )
+
+    def test_default_prompt_without_langfuse(self):
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=None):
+            cache = PromptCache("TastePT")
+            prompt, version = cache.get()
+
+        self.assertIsNone(version)
+        self.assertEqual(cache.source, "default")
+        self.assertIn("conversation", prompt.input_variables)
+
+    def test_refresh_persists_last_version_for_cold_start(self):
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=self.langfuse):
+            self.assertTrue(PromptCache("TastePT").refresh())
+
+        # Langfuse 장애 중 재시작해도 디스크의 마지막 버전 사용
+        self.langfuse.get_prompt.side_effect = ConnectionError("down")
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=self.langfuse):
+            cache = PromptCache("TastePT")
+            prompt, version = cache.get()
+            self.assertFalse(cache.refresh())
+
+        self.assertEqual((version, cache.source), (3, "disk"))
+        self.assertEqual(cache.version, 3)
+        # Langfuse 프롬프트에 대화 맥락 변수가 없으면 시스템 메시지로 추가
+        self.assertIn("conversation", prompt.input_variables)
+
+    def test_prompt_and_version_are_swapped_together(self):
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=self.langfuse):
+            cache = PromptCache("TastePT")
+            before = cache.get()
+            cache.refresh()
+            prompt, version = cache.get()
+
+        self.assertEqual(before[1], None)
+        self.assertEqual(version, 3)
+        # 기본 프롬프트에만 있는 변수가 없어야 Langfuse 프롬프트와 버전이 짝이 맞음
+        self.assertIn("user_data", before[0].input_variables)
+        self.assertNotIn("user_data", prompt.input_variables)
+        self.assertEqual(cache.version, version)
+
+    def test_stale_prompt_refreshes_in_background(self):
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=self.langfuse):
+            cache = PromptCache("TastePT")
+            with mock.patch("chatbot.prompts.Thread") as thread:
+                _, version = cache.get()
+
+        # 요청 처리 중에는 기다리지 않고 기존 프롬프트 반환
+        self.assertIsNone(version)
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs["target"], cache.refresh)
+        self.langfuse.get_prompt.assert_not_called()
+
+    def test_warm_up_waits_for_langfuse_without_saved_copy(self):
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=self.langfuse):
+            cache = PromptCache("TastePT")
+            self.assertEqual(cache.warm_up(), "langfuse")
+
+        self.assertEqual(cache.get()[1], 3)
+
+    def test_warm_up_logs_fallback_to_default_prompt(self):
+        released = threading.Event()
+        self.addCleanup(released.set)
+        self.langfuse.get_prompt.side_effect = lambda name: released.wait(5)
+
+        with mock.patch("chatbot.prompts.get_langfuse", return_value=self.langfuse):
+            cache = PromptCache("TastePT")
+            with self.assertLogs("chatbot.prompts", "ERROR"):
+                self.assertEqual(cache.warm_up(timeout=0.1), "default")
+
+
+# 챗봇용 사용자 정보 캐시 테스트
+class ProfileCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.peanut = Allergy.objects.create(ingredient="땅콩")
+        self.milk = Allergy.objects.create(ingredient="우유")
+        self.korean = PreferredCuisine.objects.create(cuisine="한식")
+        self.user = get_user_model().objects.create_user(
+            email="profile@example.com", nickname="profile", age=30, gender="F"
+        )
+        self.user.allergies.add(self.peanut)
+        self.profiles = ProfileCache({"LOCAL_TTL": 60})
+        patcher = mock.patch("chatbot.profile.profile_cache", self.profiles)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshot_is_prompt_ready(self):
+        profile = async_to_sync(self.profiles.aget)(self.user.pk)
+
+        self.assertEqual(profile["allergies"], ["땅콩"])
+        self.assertEqual(profile["prompt"], render_profile(profile))
+        self.assertIn("알러지: 땅콩", profile["prompt"])
+        self.assertIn("성별: 여자", profile["prompt"])
+        self.assertNotIn("profile@example.com", profile["prompt"])
+
+    def test_cached_lookup_skips_database(self):
+        with self.assertNumQueries(3):
+            async_to_sync(self.profiles.aget)(self.user.pk)
+        with self.assertNumQueries(0):
+            async_to_sync(self.profiles.aget)(self.user.pk)
+
+        # 다른 워커(메모리 캐시가 빈 프로세스)는 Redis에서 가져옴
+        with self.assertNumQueries(0):
+            other = async_to_sync(ProfileCache().aget)(self.user.pk)
+        self.assertEqual(other["allergies"], ["땅콩"])
+
+    def test_m2m_change_invalidates(self):
+        async_to_sync(self.profiles.aget)(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.allergies.add(self.milk)
+        self.assertEqual(
+            async_to_sync(self.profiles.aget)(self.user.pk)["allergies"],
+            ["땅콩", "우유"],
+        )
+
+        # 알러지 쪽에서 관계를 지워도 연결됐던 사용자의 캐시를 지움
+        with self.captureOnCommitCallbacks(execute=True):
+            self.peanut.user_set.clear()
+        self.assertEqual(
+            async_to_sync(self.profiles.aget)(self.user.pk)["allergies"], ["우유"]
+        )
+
+    def test_profile_update_invalidates(self):
+        async_to_sync(self.profiles.aget)(self.user.pk)
+        serializer = ProfileUpdateSerializer(
+            self.user,
+            data={"diet": True, "preferred_cuisine": ["한식"]},
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+        profile = async_to_sync(self.profiles.aget)(self.user.pk)
+        self.assertTrue(profile["diet"])
+        self.assertEqual(profile["preferred_cuisine"], ["한식"])
+        self.assertIn("다이어트 중: 예", profile["prompt"])
+
+    def test_user_save_invalidates(self):
+        async_to_sync(self.profiles.aget)(self.user.pk)
+        self.user.nickname = "renamed"
+        self.user.diet = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        profile = async_to_sync(self.profiles.aget)(self.user.pk)
+        self.assertIn("닉네임: renamed", profile["prompt"])
+        self.assertTrue(profile["diet"])
+
+
+# ASGI 앱을 통한 채팅 부하 테스트 명령 테스트
+# (명령이 자체 이벤트 루프의 스레드에서 DB를 쓰므로 TransactionTestCase 사용)
+class LoadTestChatCommandTest(TransactionTestCase):
+
+    def run_load_test(self, **options):
+        stdout = StringIO()
+        call_command(
+            "load_test_chat",
+            rooms=3,
+            messages=2,
+            history=4,
+            recipes=20,
+            embedding_latency=0.0,
+            llm_latency=0.0,
+            tokens_per_second=0.0,
+            stdout=stdout,
+            **options,
+        )
+        return json.loads(stdout.getvalue())
+
+    def test_every_turn_is_answered_and_cleaned_up(self):
+        for stream in (False, True):
+            with mock.patch.object(summarize_room, "apply_async") as apply_async:
+                report = self.run_load_test(stream=stream)
+
+            # 명령 스스로 요약 작업 예약을 끔
+            apply_async.assert_not_called()
+
+            self.assertEqual(report["rooms"]["connected"], 3)
+            self.assertEqual(report["rooms"]["messages"], 6)
+            self.assertEqual(report["rooms"]["errors"], 0)
+            self.assertEqual(report["turn"]["count"], 6)
+            self.assertEqual(report["config"]["stream"], stream)
+
+        # 부하 테스트용 사용자/채팅방은 끝나면 삭제
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(ChatRoom.objects.exists())
+
+
+# 워커 시작 시 챗봇 RAG 스택을 불러오지 않는지 테스트
+class StartupProfileTest(SimpleTestCase):
+
+    def test_urlconf_does_not_load_rag_stack(self):
+        with tempfile.NamedTemporaryFile("r", suffix=".json") as output:
+            call_command(
+                "profile_startup",
+                "--top",
+                "3",
+                "--output",
+                output.name,
+                stdout=StringIO(),
+            )
+            report = json.load(output)
+
+        stages = {stage["stage"]: stage for stage in report["stages"]}
+        self.assertEqual(stages["django.setup"]["heavy"], [])
+        self.assertEqual(stages["urlconf"]["heavy"], [])
+        self.assertIn("chatbot.routing", stages)
+
+
+class EchoChatbot:
+    async def ask(self, query, user_data, conversation="", admit=None):
+        return AIMessage(content=f"답변: {query}")
+
+
+# 채팅 소비자 저장 경로 테스트
+@mock.patch("chatbot.consumers.schedule_summary", mock.Mock())
+@mock.patch("chatbot.consumers.get_user_data", mock.AsyncMock(return_value={}))
+@mock.patch("chatbot.consumers.engine.aget", mock.AsyncMock(return_value=EchoChatbot()))
+class ChatConsumerTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="consumer@example.com", nickname="consumer"
+        )
+        self.room = ChatRoom.objects.create(name="consumer", created_by=self.user)
+
+    async def test_ask_saves_question_and_answer_once(self):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chatbot/{self.room.id}/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {"kwargs": {"room_id": str(self.room.id)}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        history = await communicator.receive_json_from()
+        self.assertEqual(history["messages"], [])
+
+        await communicator.send_json_to({"message": "양파 요리"})
+        frame = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        messages = [
+            msg
+            async for msg in ChatMessage.objects.filter(room=self.room).order_by("id")
+        ]
+        self.assertEqual(
+            [(m.message_type, m.message) for m in messages],
+            [
+                (ChatMessage.USER_QUESTION, "양파 요리"),
+                (ChatMessage.CHATBOT_RESPONSE, "답변: 양파 요리"),
+            ],
+        )
+        self.assertEqual(frame["message_id"], messages[1].id)
+        self.assertEqual(frame["parent_id"], messages[0].id)
+        self.assertEqual(frame["timestamp"], messages[1].created_at.isoformat())
+
+    async def test_stream_sends_chunks_then_done(self):
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chatbot/{self.room.id}/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {"kwargs": {"room_id": str(self.room.id)}}
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        with mock.patch(
+            "chatbot.consumers.engine.aget",
+            mock.AsyncMock(return_value=StreamingEchoChatbot()),
+        ):
+            await communicator.send_json_to({"message": "양파 요리", "stream": True})
+            frames = []
+            while not frames or frames[-1].get("type") != "done":
+                frames.append(await communicator.receive_json_from())
+        await communicator.disconnect()
+
+        question, answer = [
+            msg
+            async for msg in ChatMessage.objects.filter(room=self.room).order_by("id")
+        ]
+        self.assertEqual(
+            [(f["type"], f.get("message")) for f in frames[:-1]],
+            [("chunk", "답변"), ("chunk", ": "), ("chunk", "양파 요리")],
+        )
+        self.assertTrue(all(f["parent_id"] == question.id for f in frames))
+        self.assertEqual(answer.message, "".join(f["message"] for f in frames[:-1]))
+        self.assertEqual(frames[-1]["message_id"], answer.id)
+        self.assertEqual(answer.parent_message_id, question.id)
+
+    async def test_next_message_does_not_wait_for_summary_queueing(self):
+        # 브로커에 연결되지 않아 요약 예약이 멈춰 있는 상황
+        broker = threading.Event()
+        self.addCleanup(broker.set)
+        queued = []
+
+        def stalled_queue_summary(room_id):
+            broker.wait(10)
+            queued.append(room_id)
+
+        communicator = WebsocketCommunicator(
+            ChatConsumer.as_asgi(), f"/ws/chatbot/{self.room.id}/"
+        )
+        communicator.scope["user"] = self.user
+        communicator.scope["url_route"] = {"kwargs": {"room_id": str(self.room.id)}}
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        with mock.patch(
+            "chatbot.consumers.schedule_summary", schedule_summary
+        ), mock.patch(
+            "chatbot.memory.aqueue_summary",
+            sync_to_async(stalled_queue_summary, thread_sensitive=False),
+        ):
+            for message in ("양파 요리", "감자 요리"):
+                await communicator.send_json_to({"message": message})
+                frame = await communicator.receive_json_from(timeout=2)
+                self.assertEqual(frame["message"], f"답변: {message}")
+            broker.set()
+            await asyncio.gather(*memory._summary_tasks)
+        await communicator.disconnect()
+
+        self.assertEqual(queued, [str(self.room.id)] * 2)
+
+
+REDIS_TEST_URL = os.environ.get("CHATBOT_TEST_REDIS_URL", "redis://localhost:6379/15")
+REDIS_CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [REDIS_TEST_URL]},
+    }
+}
+
+
+class StreamingEchoChatbot:
+    async def astream(self, query, user_data, conversation="", admit=None):
+        for token in ("답변", ": ", query):
+            yield token
+
+
+async def _room_client(room, user, message, ready, start):
+    communicator = WebsocketCommunicator(
+        ChatConsumer.as_asgi(), f"/ws/chatbot/{room.id}/"
+    )
+    communicator.scope["user"] = user
+    communicator.scope["url_route"] = {"kwargs": {"room_id": str(room.id)}}
+    await communicator.connect()
+    await communicator.receive_json_from()
+    ready.set()
+
+    if message:
+        await asyncio.to_thread(start.wait, 10)
+        await communicator.send_json_to({"message": message, "stream": True})
+    frames = []
+    while not frames or frames[-1].get("type") != "done":
+        frames.append(await communicator.receive_json_from(timeout=10))
+    await communicator.disconnect()
+    return frames
+
+
+# 별도 프로세스의 ASGI 워커 (DB 대신 저장 결과만 흉내 냄)
+def _room_worker(message, ready, start, results):
+    room = ChatRoom(id=1, name="redis")
+    user = get_user_model()(id=1, email="redis@example.com", nickname="redis")
+    ids = iter(range(1, 100))
+
+    async def create(**fields):
+        return ChatMessage(id=next(ids), created_at=timezone.now(), **fields)
+
+    with override_settings(CHANNEL_LAYERS=REDIS_CHANNEL_LAYERS), mock.patch.multiple(
+        "chatbot.consumers",
+        afetch_history_page=mock.AsyncMock(
+            return_value={"messages": [], "cursor": None, "has_more": False}
+        ),
+        aload_conversation=mock.AsyncMock(return_value=""),
+        schedule_summary=mock.Mock(),
+        get_user_data=mock.AsyncMock(return_value={}),
+    ), mock.patch.object(
+        ChatRoom.objects, "aget", mock.AsyncMock(return_value=room)
+    ), mock.patch.object(
+        ChatMessage.objects, "acreate", create
+    ), mock.patch(
+        "chatbot.consumers.engine.aget",
+        mock.AsyncMock(return_value=StreamingEchoChatbot()),
+    ):
+        frames = asyncio.run(_room_client(room, user, message, ready, start))
+    results.put((bool(message), frames))
+
+
+# 여러 워커 프로세스가 Redis 채널 레이어로 같은 방 프레임을 공유하는지 테스트
+class RedisChannelLayerTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        try:
+            redis.Redis.from_url(REDIS_TEST_URL, socket_connect_timeout=1).ping()
+        except redis.RedisError:
+            raise unittest.SkipTest(f"Redis is not available at {REDIS_TEST_URL}")
+
+    def test_stream_fans_out_across_processes(self):
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        start = context.Event()
+        readies = [context.Event() for _ in range(3)]
+        processes = [
+            context.Process(
+                target=_room_worker,
+                args=("양파 요리" if index == 0 else None, ready, start, results),
+            )
+            for index, ready in enumerate(readies)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for ready in readies:
+                self.assertTrue(ready.wait(10))
+            start.set()
+            outcomes = [results.get(timeout=20) for _ in processes]
+        finally:
+            for process in processes:
+                process.join(5)
+                if process.is_alive():
+                    process.terminate()
+
+        for sent, frames in outcomes:
+            chunks = [f["message"] for f in frames if f.get("type") == "chunk"]
+            self.assertEqual("".join(chunks), "답변: 양파 요리")
+            self.assertEqual(frames[-1]["type"], "done")
+            # 다른 탭에는 질문도 전달, 보낸 탭은 이미 화면에 표시했으므로 제외
+            questions = [f for f in frames if f.get("type") == "question"]
+            self.assertEqual(
+                [q["message"] for q in questions], [] if sent else ["양파 요리"]
+            )
@@ -0,0 +1,33 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+
+# 요청(비동기 작업) 단위 단계별 소요 시간 기록
+# collect_timings() 안에서 실행된 timed()/record_timing()만 기록되고, 밖에서는 아무 일도 하지 않음
+_timings = ContextVar("chatbot_stage_timings", default=None)
+
+
+@contextmanager
+def collect_timings():
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def record_timing(stage, seconds):
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(stage, time.perf_counter() - started)
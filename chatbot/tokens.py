@@ -0,0 +1,57 @@
+from threading import Lock
+import time
+
+
+# 인코딩 파일 다운로드에 실패하면 이 시간(초) 동안은 근사치를 쓰고 다시 시도
+RETRY_INTERVAL = 300
+
+_encodings = {}
+_failed_at = {}
+_load_lock = Lock()
+
+
+def _encoding(name):
+    encoding = _encodings.get(name)
+    if encoding is not None:
+        return encoding
+    failed_at = _failed_at.get(name)
+    if failed_at is not None and time.monotonic() - failed_at < RETRY_INTERVAL:
+        return None
+    # 다른 스레드가 받는 중이면 기다리지 않고 근사치 사용
+    if not _load_lock.acquire(blocking=False):
+        return None
+    try:
+        # 인코딩 파일을 받을 수 없는 환경(오프라인)에서는 근사치 사용
+        import tiktoken
+
+        _encodings[name] = tiktoken.get_encoding(name)
+        _failed_at.pop(name, None)
+        return _encodings[name]
+    except Exception as e:
+        _failed_at[name] = time.monotonic()
+        print(f"tiktoken encoding {name} unavailable, estimating tokens: {e}")
+        return None
+    finally:
+        _load_lock.release()
+
+
+def count_tokens(text, encoding_name="cl100k_base"):
+    encoding = _encoding(encoding_name)
+    if encoding is None:
+        # 한글은 대략 글자당 1토큰, 영문은 4바이트당 1토큰
+        return len(text.encode("utf-8")) // 3 + 1
+    return len(encoding.encode(text))
+
+
+# 토큰 예산에 맞게 글자 단위 이분 탐색으로 자름
+def truncate_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) < max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + "…"
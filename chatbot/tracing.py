@@ -0,0 +1,29 @@
+from django.conf import settings
+
+from functools import lru_cache
+
+
+# Langfuse(챗봇 트레이싱 및 운영툴)는 처음 사용할 때 생성
+# 키가 없거나 CHATBOT_TRACING_ENABLED=False면 네트워크 없이 동작
+@lru_cache(maxsize=None)
+def get_langfuse():
+    if not settings.CHATBOT_TRACING_ENABLED:
+        return None
+    from langfuse import Langfuse
+
+    return Langfuse(**settings.LANGFUSE_CONFIG)
+
+
+@lru_cache(maxsize=None)
+def get_langfuse_handler():
+    if not settings.CHATBOT_TRACING_ENABLED:
+        return None
+    from langfuse.callback import CallbackHandler
+
+    return CallbackHandler(**settings.LANGFUSE_CONFIG)
+
+
+# 체인 실행 시 넘길 콜백 목록
+def tracing_callbacks():
+    handler = get_langfuse_handler()
+    return [handler] if handler is not None else []
@@ -1,6 +1,6 @@
 from django.urls import path
 from ninja import NinjaAPI
-from .views import router, test
+from .views import metrics, router, test
 
 
 api = NinjaAPI()
@@ -9,4 +9,5 @@ api.add_router("", router)
 urlpatterns = [
     path("chatbot/", api.urls, name="chatbot_api"),
     path("test/", test, name="chatbot_test"),
+    path("metrics/", metrics, name="chatbot_metrics"),
 ]
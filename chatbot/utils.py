@@ -1,7 +1,6 @@
-from accounts.serializers import UserSerializer
 from asgiref.sync import sync_to_async
 
-from .chatbot import VectorStoreManager
+from .profile import profile_cache
 
 
 @sync_to_async
@@ -9,11 +8,13 @@ def check_authentication(request):
     return request.user.is_authenticated
 
 
-@sync_to_async
-def get_user_data(user):
-    return UserSerializer(user).data
+# 프롬프트용 사용자 정보 스냅샷 (캐시에 있으면 DB를 조회하지 않음)
+async def get_user_data(user):
+    return await profile_cache.aget(user.pk)
 
 
 @sync_to_async
 def add_vector_file():
+    from .chatbot import VectorStoreManager
+
     VectorStoreManager().add_file()
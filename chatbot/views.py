@@ -8,9 +8,13 @@ from .schema import (
     ChatbotResponseSchema,
     ErrorSchema,
     ChatRoomSchema,
+    EngineReloadSchema,
+    EngineStatusSchema,
 )
 from .models import ChatRoom
-from .chatbot import Chatbot_Run
+from .admission import QueueFull, admission
+from .engine import engine
+from .metrics import track_turn
 
 
 router = Router()
@@ -79,7 +83,9 @@ def delete_room(request, room_id: int):
 
 
 # 챗봇 테스트용(비동기api)
-@router.post("/test/", response={200: ChatbotResponseSchema, 400: ErrorSchema})
+@router.post(
+    "/test/", response={200: ChatbotResponseSchema, 400: ErrorSchema, 503: ErrorSchema}
+)
 async def chatbot_endpoint(request, payload: ChatbotRequestSchema):
 
     # 사용자 인증 확인 - 비동기적으로 처리
@@ -93,16 +99,58 @@ async def chatbot_endpoint(request, payload: ChatbotRequestSchema):
     question = payload.question
 
     # 챗봇을 통해 응답 생성
-    chatbot = Chatbot_Run()
-    user_data_str = await sync_to_async(str)(user_data)
-    response = await chatbot.ask(question, user_data_str)
-    response_content = await sync_to_async(str)(response.content)
+    try:
+        with track_turn("api"):
+            chatbot = await engine.aget()
+            response = await chatbot.ask(
+                question, user_data, admit=lambda: admission.slot(user.pk)
+            )
+            response_content = await sync_to_async(str)(response.content)
+    except QueueFull as e:
+        return 503, {"detail": str(e)}
 
     return 200, {"answer": response_content}
 
 
+# 챗봇 엔진 상태 조회 (관리자 전용)
+@router.get("engine/", response={200: EngineStatusSchema, 400: ErrorSchema})
+def engine_status(request):
+    if not request.user.is_staff:
+        return 400, {"detail": "관리자만 접근할 수 있습니다."}
+    return engine.status()
+
+
+# 재시작 없이 프롬프트/LLM 설정 교체 (관리자 전용)
+@router.post("engine/reload/", response={200: EngineStatusSchema, 400: ErrorSchema})
+def engine_reload(request, payload: EngineReloadSchema):
+    if not request.user.is_staff:
+        return 400, {"detail": "관리자만 접근할 수 있습니다."}
+    llm_config = payload.dict(exclude_none=True)
+    return engine.reload(llm_config)
+
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import render_metrics
 
 
 def test(request):
     return render(request, "chatbot/test.html")
+
+
+# Prometheus 메트릭 (관리자 또는 CHATBOT_METRICS_TOKEN을 가진 수집기만 접근)
+# 요청을 받은 워커뿐 아니라 Redis에 올라온 모든 워커의 값을 합쳐서 반환
+def metrics(request):
+    token = settings.CHATBOT_METRICS_TOKEN
+    authorization = request.headers.get("Authorization", "")
+    if not (
+        request.user.is_staff
+        or (token and constant_time_compare(authorization, f"Bearer {token}"))
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -5,6 +5,16 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 django_application = get_asgi_application()
 
+from django.conf import settings
+from chatbot.engine import engine
+
+# 워커 시작 시 챗봇 엔진 미리 준비 (실패 시 첫 요청에서 다시 생성)
+if settings.CHATBOT_WARM_UP_ON_STARTUP:
+    try:
+        engine.warm_up()
+    except Exception as e:
+        print(f"Chatbot engine warm-up failed: {e}")
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.sessions import SessionMiddlewareStack
@@ -115,12 +115,6 @@ AUTH_USER_MODEL = "accounts.User"
 
 ASGI_APPLICATION = "config.asgi.application"
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    }
-}
-
 WSGI_APPLICATION = "config.wsgi.application"
 
 # 인증 방식을 세션과 기본 인증으로 변경함
@@ -166,6 +160,19 @@ CACHES = {
     }
 }
 
+# 채널 레이어 설정 (여러 ASGI 워커가 채팅방 그룹을 공유)
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {
+            "hosts": [REDIS_URL],
+            # 스트리밍 답변은 토큰마다 그룹 메시지를 보내므로 여유 있게 설정
+            "capacity": 1000,
+            "expiry": 30,
+        },
+    }
+}
+
 # Node.js 웹소켓 서버 URL
 NODE_SERVER_URL = env("NODE_SERVER_URL")
 
@@ -176,6 +183,11 @@ if env("CI") == "true":
             "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         }
     }
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -249,6 +261,18 @@ else:
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# 로깅 설정 (챗봇 로그는 콘솔로 출력)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "chatbot": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 # Langfuse 설정
 LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
 LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
@@ -259,6 +283,104 @@ LANGFUSE_CONFIG = {
     "public_key": LANGFUSE_PUBLIC_KEY,
     "host": LANGFUSE_HOST,
 }
+CHATBOT_TRACING_ENABLED = env.bool(
+    "CHATBOT_TRACING_ENABLED",
+    default=bool(LANGFUSE_SECRET_KEY and LANGFUSE_PUBLIC_KEY),
+)
+
+# 챗봇 엔진 설정
+CHATBOT_PROMPT_NAME = "TastePT"
+# Langfuse 프롬프트 캐시 (TTL마다 백그라운드에서 갱신, 마지막 버전은 디스크에 저장)
+CHATBOT_PROMPT_CACHE = {
+    "TTL": 300,
+    "DIRECTORY": os.path.join(BASE_DIR, "vectors_data", "prompts"),
+    "WARM_UP_TIMEOUT": 10,  # 디스크 사본이 없을 때 시작 시 Langfuse 프롬프트를 기다리는 시간(초)
+}
+CHATBOT_LLM_CONFIG = {
+    "model_name": "gpt-4o-mini",
+    "temperature": 0.9,
+}
+
+# 임베딩/LLM 제공자 (openai, onnx, fake)
+# 임베딩 제공자를 바꾼 뒤에는 rebuild_vectors 실행
+CHATBOT_PROVIDERS = {
+    "EMBEDDING": env("CHATBOT_EMBEDDING_PROVIDER", default="openai"),
+    "LLM": env("CHATBOT_LLM_PROVIDER", default="openai"),
+    "ONNX_MODEL_DIR": env(
+        "CHATBOT_ONNX_MODEL_DIR",
+        default=os.path.join(BASE_DIR, "models", "all-MiniLM-L6-v2"),
+    ),
+    # 네트워크 없이 벤치마크/부하 테스트할 때 쓰는 가짜 제공자 설정
+    "FAKE": {
+        "EMBEDDING_DIM": 384,
+        "EMBEDDING_LATENCY": env.float("CHATBOT_FAKE_EMBEDDING_LATENCY", default=0.0),
+        "LLM_LATENCY": env.float("CHATBOT_FAKE_LLM_LATENCY", default=0.0),
+        "TOKENS_PER_SECOND": env.float("CHATBOT_FAKE_TOKENS_PER_SECOND", default=0.0),
+        "RESPONSE_TOKENS": 80,
+    },
+}
+# LLM 동시 호출 제한 (워커 프로세스 단위)
+CHATBOT_ADMISSION = {
+    "MAX_CONCURRENT": 8,  # 동시에 생성 중인 답변 수
+    "PER_USER": 1,  # 사용자 한 명이 동시에 차지할 수 있는 자리
+    "MAX_QUEUE": 32,  # 대기열 길이 (넘으면 바로 거절)
+}
+
+# 대화 맥락 (최근 대화 + 방 요약)
+CHATBOT_MEMORY = {
+    "RECENT_TURNS": 3,  # 그대로 넣는 최근 질문/답변 수
+    "RECENT_TOKENS": 1000,  # 최근 대화 토큰 예산
+    "SUMMARY_TOKENS": 300,  # 방 요약 길이
+    "SUMMARY_BATCH_TOKENS": 4000,  # 요약 작업 한 번에 넣는 이전 대화 토큰 수
+    "SUMMARY_DEBOUNCE": 60,  # 같은 방 요약 작업 중복 예약 방지(초)
+    "SUMMARY_ENABLED": True,  # 답변 후 방 요약 작업 예약 (부하 테스트에서는 끔)
+}
+# 챗봇용 사용자 정보 캐시 (프로세스 메모리 + Redis, 프로필 수정 시 삭제)
+CHATBOT_PROFILE_CACHE = {
+    "LOCAL_SIZE": 1024,
+    "LOCAL_TTL": 10,  # 다른 워커에서 바뀐 프로필이 반영되기까지 최대 시간(초)
+    "TTL": 60 * 60,
+}
+CHATBOT_HISTORY_PAGE_SIZE = 50  # 웹소켓 연결 시/이전 메시지 요청 시 보내는 메시지 수
+
+# /api/v1/metrics/ 수집용 토큰 (Authorization: Bearer <토큰>, 비어 있으면 관리자만 접근)
+CHATBOT_METRICS_TOKEN = env("CHATBOT_METRICS_TOKEN", default="")
+CHATBOT_WARM_UP_ON_STARTUP = env.bool("CHATBOT_WARM_UP_ON_STARTUP", default=True)
+CHATBOT_ENGINE_SYNC_INTERVAL = 30  # 다른 워커의 핫스왑 반영 주기(초)
+
+# 비슷한 질문 답변 캐시
+CHATBOT_SEMANTIC_CACHE = {
+    "ENABLED": env.bool("CHATBOT_SEMANTIC_CACHE_ENABLED", default=True),
+    "THRESHOLD": 0.95,  # 코사인 유사도 기준
+    "TTL": 60 * 60 * 24,
+    "MAX_ENTRIES": 200,  # 사용자 정보 지문당 최대 답변 수
+}
+
+# 임베딩 캐시 (프로세스 메모리 LRU + Redis, Redis에는 질문 임베딩만 저장)
+CHATBOT_EMBEDDING_CACHE = {
+    "LOCAL_SIZE": 2048,
+    "TTL": 60 * 60 * 24 * 7,
+}
+
+# 하이브리드 검색 (MMR 벡터 검색 + BM25)
+CHATBOT_HYBRID_SEARCH = {
+    "BM25_K": 10,
+    "RRF_K": 60,
+    "EXACT_MAX_LENGTH": 10,  # 이 길이 이하의 질문은 문서에 그대로 있으면 BM25만 사용
+}
+
+# 프롬프트에 넣는 레시피 정보 (같은 행의 청크는 합치고, 예산을 넘는 레시피는 제외)
+CHATBOT_CONTEXT = {
+    "MAX_TOKENS": 1500,
+}
+
+# 레시피 CSV 임베딩
+CHATBOT_INGESTION = {
+    "BATCH_SIZE": 100,  # 임베딩 요청 1회당 청크 수
+    "CONCURRENCY": 4,  # 동시에 보내는 임베딩 요청 수
+    "CHUNK_SIZE": 700,  # 청크 길이 (바꾼 뒤 rebuild_vectors 실행)
+    "CHUNK_OVERLAP": 150,
+}
 
 # 이메일 설정
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -279,3 +401,16 @@ else:
 
 CELERY_ACCEPT_CONTENT = ["json"]  # Celery가 수용할 작업의 콘텐츠 형식
 CELERY_TASK_SERIALIZER = "json"  # Celery가 작업을 직렬화할 때 사용할 형식
+# 작업 예약 시 브로커 연결 재시도를 짧게 (기본값은 장애 때 예약 한 번에 약 6초 대기)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "max_retries": 1,
+    "interval_start": 0,
+    "interval_step": 0.2,
+    "interval_max": 0.5,
+    "socket_connect_timeout": 2,
+}
+
+# 오래 걸리는 레시피 임베딩은 전용 큐로 분리 (이메일 발송과 워커를 나눠 씀)
+CELERY_TASK_ROUTES = {
+    "chatbot.tasks.embed_recipe": {"queue": "embedding"},
+}
@@ -14,5 +14,9 @@ worker_class = "sync"
 max_requests = 1000
 max_requests_jitter = 50
 
+# 마스터에서 앱을 한 번만 불러오고 워커는 fork로 생성 (max_requests 재시작 비용 감소)
+# 챗봇 RAG 스택은 첫 사용 때 불러오므로 마스터에는 Django/URLconf만 올라감
+preload_app = True
+
 # 프로세스 이름
 proc_name = "tastept_app"